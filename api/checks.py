@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .utils import is_local_cache
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_caches(app_configs, **kwargs):
+    errors = []
+    if settings.TYPEAHEAD_CACHE_TTL and is_local_cache(settings.TYPEAHEAD_GENERATION_CACHE):
+        errors.append(Warning(
+            f"TYPEAHEAD_GENERATION_CACHE ({settings.TYPEAHEAD_GENERATION_CACHE!r}) is not shared "
+            "between processes, so the search-as-you-type cache is turned off: writes in one worker "
+            "could not invalidate the results cached by the others.",
+            hint='Point it at a shared cache such as Redis or Memcached, or set TYPEAHEAD_CACHE_TTL = 0.',
+            id='api.W001',
+        ))
+    if settings.API_THROTTLE_STORE == 'cache' and is_local_cache(settings.API_THROTTLE_CACHE):
+        errors.append(Warning(
+            f"API_THROTTLE_CACHE ({settings.API_THROTTLE_CACHE!r}) is not shared between processes, "
+            "so rate limits are counted per worker.",
+            hint='Point it at a shared cache such as Redis or Memcached.',
+            id='api.W002',
+        ))
+    return errors
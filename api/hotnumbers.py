@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .snapshot import current_change_position, number_changed_since
+
+logger = logging.getLogger(__name__)
+
+
+class CountMinSketch:
+    """
+    Approximate per-key counts in fixed memory (width x depth 32-bit counters).
+    Uses conservative update, and halves every counter after `sample_size`
+    additions (as in TinyLFU) so that popularity follows recent traffic.
+    """
+
+    def __init__(self, width=4096, depth=4, sample_size=None):
+        self.width = width
+        self.depth = depth
+        self.sample_size = sample_size or width * 10
+        self._counters = array('I', bytes(4 * width * depth))
+        self._additions = 0
+
+    @property
+    def memory_bytes(self):
+        return self._counters.itemsize * len(self._counters)
+
+    def _slots(self, key):
+        return [row * self.width + hash((row, key)) % self.width for row in range(self.depth)]
+
+    def add(self, key):
+        slots = self._slots(key)
+        counters = self._counters
+        estimate = min(counters[slot] for slot in slots) + 1
+        for slot in slots:
+            if counters[slot] < estimate:
+                counters[slot] = estimate
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._age()
+        return estimate
+
+    def estimate(self, key):
+        return min(self._counters[slot] for slot in self._slots(key))
+
+    def _age(self):
+        self._counters = array('I', (count >> 1 for count in self._counters))
+        self._additions //= 2
+
+
+class HotNumbers:
+    """
+    Tracks phone lookup popularity and pins precomputed lookup payloads for the
+    hottest numbers. The sketch keeps approximate counts for every number; a small
+    candidate set remembers which numbers are worth considering for pinning.
+
+    Payloads are only served while their number has no change feed event after the
+    position taken before they were loaded, so writes during a warm-up and writes
+    through other processes are never hidden by a pinned payload.
+    """
+
+    def __init__(self, loader, top_n=100, sketch=None):
+        self.loader = loader
+        self.top_n = top_n
+        self.sketch = sketch or CountMinSketch()
+        self.max_candidates = top_n * 4
+        self._candidates = {}
+        self._floor = 0
+        self._pinned = {}
+        self._pinned_position = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.last_warmed_at = None
+
+    def record(self, phone_number):
+        with self._lock:
+            estimate = self.sketch.add(phone_number)
+            candidates = self._candidates
+            if phone_number in candidates or len(candidates) < self.max_candidates:
+                candidates[phone_number] = estimate
+                self._floor = min(self._floor, estimate) if len(candidates) > 1 else estimate
+            elif estimate > self._floor:
+                # Replace the least popular candidate
+                del candidates[min(candidates, key=candidates.get)]
+                candidates[phone_number] = estimate
+                self._floor = min(candidates.values())
+
+    def get_pinned(self, phone_number):
+        position, payload = self._pinned_position, self._pinned.get(phone_number)
+        if payload is not None and number_changed_since(phone_number, position):
+            self.unpin(phone_number)
+            payload = None
+        if payload is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return payload
+
+    def unpin(self, phone_number):
+        self._pinned.pop(phone_number, None)
+
+    def top(self):
+        with self._lock:
+            # Re-estimate, counts may have been halved since they were recorded
+            estimates = {phone: self.sketch.estimate(phone) for phone in self._candidates}
+            self._candidates = estimates
+            self._floor = min(estimates.values(), default=0)
+        return sorted(estimates.items(), key=lambda item: item[1], reverse=True)[:self.top_n]
+
+    def warm(self):
+        position = current_change_position()
+        pinned = {}
+        for phone_number, _ in self.top():
+            pinned[phone_number] = self.loader(phone_number)
+        # Swap in the new set at once; lookups never see a half-built one. The older
+        # position stays until the new set is in, which at worst skips a payload.
+        self._pinned = pinned
+        self._pinned_position = position
+        self.last_warmed_at = time.time()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'pinned': len(self._pinned),
+            'candidates': len(self._candidates),
+            'sketch_width': self.sketch.width,
+            'sketch_depth': self.sketch.depth,
+            'sketch_memory_bytes': self.sketch.memory_bytes,
+            'last_warmed_at': self.last_warmed_at,
+        }
+
+
+def _warm_forever(hot_numbers, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            hot_numbers.warm()
+        except Exception:
+            logger.exception('Warming hot phone numbers failed.')
+        finally:
+            close_old_connections()
+
+
+_hot_numbers = None
+_hot_numbers_lock = threading.Lock()
+
+
+def get_hot_numbers(loader=None):
+    """
+    The process-wide tracker. The first caller supplies the payload loader, and a
+    daemon thread re-warms the pinned payloads every HOT_NUMBERS_WARM_INTERVAL seconds.
+    """
+    global _hot_numbers
+    if _hot_numbers is None:
+        with _hot_numbers_lock:
+            if _hot_numbers is None:
+                hot_numbers = HotNumbers(loader, top_n=settings.HOT_NUMBERS_PINNED)
+                interval = settings.HOT_NUMBERS_WARM_INTERVAL
+                if interval and loader is not None:
+                    threading.Thread(
+                        target=_warm_forever, args=(hot_numbers, interval),
+                        name='hot-number-warmer', daemon=True,
+                    ).start()
+                _hot_numbers = hot_numbers
+    return _hot_numbers
+
+
+def unpin_number(phone_number):
+    # Called on writes, does not create the tracker. Drops the payload right away;
+    # get_pinned would skip it anyway once the write's change event is committed.
+    if _hot_numbers is not None:
+        _hot_numbers.unpin(phone_number)
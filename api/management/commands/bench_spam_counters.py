@@ -0,0 +1,83 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.test import override_settings
+
+from api.models import SpamCounterStripe, SpamReport, SpamScore
+from api.utils import get_report_counts
+from auth_user.models import User
+
+REPORTER_PHONE_FORMAT = '+1888800{:05d}'
+TARGET_PHONE_FORMAT = '+1888899{:02d}{:03d}'
+
+class Command(BaseCommand):
+    help = (
+        'Measures spam report throughput when many reporters mark the same number at once, '
+        'with a single counter row vs striped counters. Test rows are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reporters', type=int, default=64, help='Parallel reporters (threads with their own connection).')
+        parser.add_argument('--rounds', type=int, default=20, help='Numbers reported by every reporter, one after another.')
+        parser.add_argument('--stripes', type=int, default=16, help='Stripes for the striped run.')
+
+    def handle(self, *args, **options):
+        reporters = [
+            User(phone_number=REPORTER_PHONE_FORMAT.format(i), name=f'Spam bench {i}')
+            for i in range(options['reporters'])
+        ]
+        for user in reporters:
+            user.set_unusable_password()
+        reporters = User.objects.bulk_create(reporters)
+        self.stdout.write(f"{options['reporters']} reporters, {options['rounds']} numbers each, database {connection.vendor}")
+
+        try:
+            for run, stripes in enumerate((1, options['stripes'])):
+                with override_settings(SPAM_COUNTER_STRIPES=stripes):
+                    elapsed, latencies, errors = self._run(run, reporters, options['rounds'])
+                label = 'single row' if stripes == 1 else f'{stripes} stripes'
+                targets = [TARGET_PHONE_FORMAT.format(run, r) for r in range(options['rounds'])]
+                counted = sum(get_report_counts(targets).values())
+                self.stdout.write(
+                    f"{label:>12}: {len(latencies) / elapsed:8.1f} reports/s, "
+                    f"p50 {statistics.median(latencies) * 1000 if latencies else 0:.1f} ms, "
+                    f"max {max(latencies, default=0) * 1000:.1f} ms, {errors} failed, "
+                    f"{counted} counted"
+                )
+        finally:
+            bench_numbers = {'phone_number__startswith': TARGET_PHONE_FORMAT[:8]}
+            SpamReport.objects.filter(**bench_numbers).delete()
+            SpamCounterStripe.objects.filter(**bench_numbers).delete()
+            SpamScore.objects.filter(**bench_numbers).delete()
+            User.objects.filter(pk__in=[user.pk for user in reporters]).delete()
+
+    def _run(self, run, reporters, rounds):
+        # Every reporter reports the same number at the same moment, round after round
+        barrier = threading.Barrier(len(reporters))
+        latencies, errors = [], []
+
+        def report(user):
+            try:
+                for r in range(rounds):
+                    phone_number = TARGET_PHONE_FORMAT.format(run, r)
+                    barrier.wait()
+                    start = time.perf_counter()
+                    try:
+                        SpamReport.objects.create(phone_number=phone_number, reported_by=user)
+                    except DatabaseError:
+                        errors.append(phone_number)
+                        continue
+                    latencies.append(time.perf_counter() - start)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=report, args=(user,)) for user in reporters]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start, latencies, len(errors)
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from api import throttling
+from auth_user.models import User
+
+class BenchView(APIView):
+    throttle_scope = 'bench'
+
+class Command(BaseCommand):
+    help = 'Measures per-request overhead of the GCRA throttles for each store.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100000, help='Throttle checks per store.')
+        parser.add_argument('--keys', type=int, default=1000, help='Distinct users the requests are spread over.')
+
+    def handle(self, *args, **options):
+        throttle_classes = [throttling.ScopedGCRAThrottle, throttling.ScopedIPGCRAThrottle]
+        rates = {'bench': '1000000/s', 'bench_ip': '1000000/s'}
+        factory = APIRequestFactory()
+        requests = []
+        for i in range(options['keys']):
+            request = factory.get('/', REMOTE_ADDR=f'10.0.{i // 256 % 256}.{i % 256}')
+            # Unsaved users: only the pk is used for the throttle key
+            request.user = User(pk=i + 1)
+            requests.append(request)
+        view = BenchView()
+
+        for name, store_class in throttling.STORES.items():
+            throttling._store = store_class()
+            original_rates = throttling.ScopedGCRAThrottle.THROTTLE_RATES
+            throttling.ScopedGCRAThrottle.THROTTLE_RATES = rates
+            try:
+                start = time.perf_counter()
+                for n in range(options['requests']):
+                    request = requests[n % len(requests)]
+                    for throttle_class in throttle_classes:
+                        throttle_class().allow_request(request, view)
+                elapsed = time.perf_counter() - start
+            finally:
+                throttling.ScopedGCRAThrottle.THROTTLE_RATES = original_rates
+                throttling._store = None
+            self.stdout.write(
+                f"{name:>6}: {elapsed / options['requests'] * 1e6:.2f} us per request "
+                f"(user + IP throttle, {options['keys']} keys)"
+            )
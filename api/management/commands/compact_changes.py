@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.outbox import compact_changes
+
+class Command(BaseCommand):
+    help = 'Deletes change feed events that every consumer has processed, and events older than --max-age-days.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=int, default=None, help='Also delete events older than this, processed or not.')
+
+    def handle(self, *args, **options):
+        max_age = timedelta(days=options['max_age_days']) if options['max_age_days'] is not None else None
+        deleted = compact_changes(max_age)
+        self.stdout.write(self.style.SUCCESS(f'{deleted} change events deleted.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.scores import compact_spam_counters
+
+class Command(BaseCommand):
+    help = 'Folds the striped spam report counters into SpamScore.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Numbers compacted per transaction.')
+
+    def handle(self, *args, **options):
+        compacted = compact_spam_counters(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Compacted spam counters for {compacted} numbers.'))
@@ -0,0 +1,40 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.outbox import consume_changes
+
+class Command(BaseCommand):
+    help = 'Prints change feed events after the consumer\'s cursor as JSON lines and advances the cursor.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('consumer', help='Consumer name; each consumer keeps its own cursor.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--settle-seconds', type=int, default=0, help='Skip events newer than this, to let concurrent transactions commit.')
+        parser.add_argument('--follow', action='store_true', help='Keep polling for new events.')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between polls with --follow.')
+
+    def handle(self, *args, **options):
+        while True:
+            handled = consume_changes(
+                options['consumer'], self._write_batch,
+                batch_size=options['batch_size'], settle_seconds=options['settle_seconds'],
+            )
+            if not options['follow']:
+                self.stderr.write(f'{handled} events consumed.')
+                return
+            if not handled:
+                time.sleep(options['poll_interval'])
+
+    def _write_batch(self, events):
+        for event in events:
+            self.stdout.write(json.dumps({
+                'id': event.id,
+                'model': event.model,
+                'object_id': event.object_id,
+                'action': event.action,
+                'phone_number': event.phone_number,
+                'created_at': event.created_at.isoformat(),
+            }))
+        self.stdout.flush()
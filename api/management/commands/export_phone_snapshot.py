@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from auth_user.models import User
+from api.models import Contact, SpamCounterStripe, SpamScore
+from api.snapshot import PhoneSnapshot, current_change_position, save_change_position, write_snapshot
+
+class Command(BaseCommand):
+    help = 'Exports users, contacts and spam report counts into a memory-mappable phone lookup snapshot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help='Snapshot file path (defaults to PHONE_SNAPSHOT_PATH).')
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.PHONE_SNAPSHOT_PATH
+        if not path:
+            raise CommandError('Pass --output or set PHONE_SNAPSHOT_PATH.')
+
+        # Taken before reading, so anything written during the export counts as changed
+        created_at = time.time()
+        change_position = current_change_position()
+
+        entries_by_number = {}
+        users = User.objects.order_by().values_list('phone_number', 'id', 'name', 'email')
+        for phone_number, user_id, name, email in users.iterator(chunk_size=2000):
+            entries_by_number[phone_number] = [(user_id, name, email)]
+
+        contacts = Contact.objects.exclude(
+            phone_number__in=User.objects.values('phone_number')
+        ).order_by('phone_number', 'name').values_list(
+            'phone_number', 'registered_user_id', 'name', 'registered_user__email'
+        )
+        for phone_number, user_id, name, email in contacts.iterator(chunk_size=2000):
+            entries_by_number.setdefault(phone_number, []).append((user_id, name, email))
+
+        # Compacted counts and the stripes not compacted yet, in one statement: compaction
+        # writes no change events, so a compaction committing between two reads would
+        # leave a short count in the file until the next export
+        compacted = SpamScore.objects.order_by().values_list('phone_number', 'report_count')
+        stripes = SpamCounterStripe.objects.order_by().values_list('phone_number', 'count')
+        spam_counts = {}
+        for phone_number, count in compacted.union(stripes, all=True).iterator(chunk_size=2000):
+            spam_counts[phone_number] = spam_counts.get(phone_number, 0) + count
+
+        numbers = (
+            (phone_number, max(spam_counts.get(phone_number, 0), 0), entries)
+            for phone_number, entries in entries_by_number.items()
+        )
+        previous_position = self._previous_change_position(path)
+        number_count, entry_count = write_snapshot(path, created_at, change_position, numbers)
+        # Processes reload the file within a few seconds; until then they still need the
+        # events after the previous export, so compaction is held at that position.
+        save_change_position(change_position if previous_position is None else min(previous_position, change_position))
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {number_count} numbers and {entry_count} entries to {path}.'
+        ))
+
+    def _previous_change_position(self, path):
+        try:
+            snapshot = PhoneSnapshot(path)
+        except (OSError, ValueError):
+            return None
+        try:
+            return snapshot.change_position
+        finally:
+            snapshot.close()
@@ -0,0 +1,259 @@
+import json
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.models import Contact
+
+DEFAULT_MIX = 'name=40,phone=40,spam=10,login=10'
+DEFAULT_PASSWORD = 'loadgen-password-123'
+# Worker N of synthetic traffic logs in as +199990 followed by N in five digits,
+# registering the account on first use
+USER_PHONE_FORMAT = '+199990{:05d}'
+SAMPLE_SIZE = 2000
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class LoadWorker:
+    # Runs in a pool process: plain urllib, no database access
+    def __init__(self, base_url, password, auth_scheme, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.password = password
+        self.auth_scheme = auth_scheme
+        self.timeout = timeout
+        self.tokens = {}
+        self.stats = defaultdict(lambda: {'latencies': [], 'statuses': Counter(), 'errors': 0})
+
+    def send(self, method, path, params=None, token=None):
+        url = self.base_url + path
+        data = None
+        headers = {'Accept': 'application/json'}
+        if method == 'GET':
+            if params:
+                url += '?' + urllib.parse.urlencode(params)
+        else:
+            data = json.dumps(params or {}).encode()
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'{self.auth_scheme} {token}'
+        request = urllib.request.Request(url, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def token_for(self, user):
+        # One login per user per process; not counted in the results
+        if user not in self.tokens:
+            credentials = {'username': user, 'password': self.password}
+            status, body = self.send('POST', '/auth/login/', credentials)
+            if status == 400:
+                self.send('POST', '/auth/register/', {
+                    'phone_number': user, 'name': f'Loadgen {user[-5:]}',
+                    'password': self.password, 'password_confirm': self.password,
+                })
+                status, body = self.send('POST', '/auth/login/', credentials)
+            if status != 200:
+                raise RuntimeError(f'Could not log in as {user}: HTTP {status}')
+            self.tokens[user] = json.loads(body)['token']
+        return self.tokens[user]
+
+    def timed(self, method, path, params=None, user=None):
+        stats = self.stats[f'{method} {path}']
+        token = self.token_for(user) if user else None
+        start = time.perf_counter()
+        try:
+            status, _ = self.send(method, path, params, token)
+        except OSError: # connection errors and timeouts, including URLError
+            stats['errors'] += 1
+            return
+        stats['latencies'].append(time.perf_counter() - start)
+        stats['statuses'][status] += 1
+
+
+def synthetic_request(rng, kind, user, password, samples):
+    name, phone_number = rng.choice(samples)
+    if kind == 'name':
+        return 'GET', '/api/search/name/', {'q': name[:rng.randint(3, 5)]}, user
+    if kind == 'phone':
+        return 'GET', '/api/search/phone/', {'phone': phone_number}, user
+    if kind == 'spam':
+        return 'POST', '/api/spam/mark/', {'phone_number': phone_number}, user
+    return 'POST', '/auth/login/', {'username': user, 'password': password}, None
+
+
+def run_worker(job):
+    worker = LoadWorker(job['url'], job['password'], job['auth_scheme'], job['timeout'])
+    entries = job.get('entries')
+
+    if entries is not None:
+        for entry in entries:
+            if entry.get('user'):
+                worker.token_for(entry['user'])
+        start = time.time()
+        for entry in entries:
+            worker.timed(entry.get('method', 'GET').upper(), entry['path'], entry.get('params'), entry.get('user'))
+    else:
+        rng = random.Random(job['seed'])
+        kinds, weights = zip(*job['mix'].items())
+        user = job['user']
+        worker.token_for(user)
+        start = time.time()
+        deadline = start + job['duration']
+        sent = 0
+        while time.time() < deadline and (not job['requests'] or sent < job['requests']):
+            kind = rng.choices(kinds, weights)[0]
+            worker.timed(*synthetic_request(rng, kind, user, job['password'], job['samples']))
+            sent += 1
+
+    return {'start': start, 'end': time.time(), 'stats': dict(worker.stats)}
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays a JSONL request log, or a synthetic traffic mix, against a running server '
+        'from a pool of processes and reports throughput, latency percentiles and error '
+        'rates per endpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server under test.')
+        parser.add_argument('--log', help='JSONL request log: one {"method", "path", "params", "user"} object per line.')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Synthetic traffic weights (default {DEFAULT_MIX}).')
+        parser.add_argument('--processes', type=int, default=4, help='Worker processes, each with its own token.')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds of synthetic traffic.')
+        parser.add_argument('--requests', type=int, default=0, help='Stop synthetic traffic after this many requests per process.')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password of the users in the log / synthetic users.')
+        parser.add_argument('--timeout', type=float, default=10, help='Per-request timeout in seconds.')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 1)
+        base_job = {
+            'url': options['url'],
+            'password': options['password'],
+            'auth_scheme': 'Bearer' if settings.AUTH_SIGNED_TOKENS else 'Token',
+            'timeout': options['timeout'],
+        }
+        if options['log']:
+            jobs = [dict(base_job, entries=shard) for shard in self._read_log(options['log'], processes)]
+        else:
+            mix = self._parse_mix(options['mix'])
+            samples = self._sample_search_terms()
+            seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+            jobs = [
+                dict(
+                    base_job, mix=mix, samples=samples, seed=seed + i, user=USER_PHONE_FORMAT.format(i),
+                    duration=options['duration'], requests=options['requests'],
+                )
+                for i in range(processes)
+            ]
+
+        # Imported here: only this command needs a process pool. Workers are forked
+        # without database connections and only talk HTTP.
+        import multiprocessing
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(f"Sending traffic to {options['url']} from {len(jobs)} processes...")
+        with context.Pool(len(jobs)) as pool:
+            try:
+                results = pool.map(run_worker, jobs)
+            except (RuntimeError, OSError) as e:
+                raise CommandError(f'Load generation failed: {e}')
+        self._report(results)
+
+    def _read_log(self, path, processes):
+        # Entries of one user stay in one process, in log order
+        shards = [[] for _ in range(processes)]
+        anonymous = 0
+        with open(path) as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    entry['path']
+                except (ValueError, KeyError, TypeError):
+                    raise CommandError(f'{path}:{line_number}: expected a JSON object with at least a "path".')
+                user = entry.get('user')
+                if user:
+                    shard = zlib.crc32(user.encode()) % processes
+                else:
+                    shard = anonymous % processes
+                    anonymous += 1
+                shards[shard].append(entry)
+        return [shard for shard in shards if shard]
+
+    def _parse_mix(self, value):
+        mix = {}
+        for part in value.split(','):
+            kind, _, weight = part.partition('=')
+            kind = kind.strip()
+            if kind not in ('name', 'phone', 'spam', 'login'):
+                raise CommandError(f'Unknown traffic kind {kind!r}; use name, phone, spam and login.')
+            try:
+                mix[kind] = float(weight)
+            except ValueError:
+                raise CommandError(f'Invalid weight for {kind!r}: {weight!r}')
+        if not any(mix.values()):
+            raise CommandError('The traffic mix needs at least one positive weight.')
+        return mix
+
+    def _sample_search_terms(self):
+        # Real names and numbers from the database, so searches hit existing rows
+        samples = list(Contact.objects.order_by().values_list('name', 'phone_number')[:SAMPLE_SIZE])
+        if not samples:
+            raise CommandError('No contacts to build searches from: run populate_data or pass --log.')
+        return samples
+
+    def _report(self, results):
+        merged = defaultdict(lambda: {'latencies': [], 'statuses': Counter(), 'errors': 0})
+        for result in results:
+            for endpoint, stats in result['stats'].items():
+                merged[endpoint]['latencies'].extend(stats['latencies'])
+                merged[endpoint]['statuses'].update(stats['statuses'])
+                merged[endpoint]['errors'] += stats['errors']
+        elapsed = max(r['end'] for r in results) - min(r['start'] for r in results)
+        elapsed = max(elapsed, 1e-9)
+
+        self.stdout.write(
+            f"{'endpoint':<32} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'4xx':>6} {'429':>6} {'5xx':>6} {'failed':>6}"
+        )
+        total = 0
+        for endpoint in sorted(merged):
+            stats = merged[endpoint]
+            latencies = sorted(stats['latencies'])
+            count = len(latencies) + stats['errors']
+            total += count
+            statuses = stats['statuses']
+            client_errors = sum(n for code, n in statuses.items() if 400 <= code < 500 and code != 429)
+            server_errors = sum(n for code, n in statuses.items() if code >= 500)
+            self.stdout.write(
+                f"{endpoint:<32} {count:8d} {count / elapsed:8.1f} "
+                f"{percentile(latencies, 50) * 1000:8.1f} {percentile(latencies, 95) * 1000:8.1f} "
+                f"{percentile(latencies, 99) * 1000:8.1f} {self._rate(client_errors, count):>6} "
+                f"{self._rate(statuses[429], count):>6} {self._rate(server_errors, count):>6} "
+                f"{self._rate(stats['errors'], count):>6}"
+            )
+        self.stdout.write(f'{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s')
+
+    @staticmethod
+    def _rate(errors, count):
+        return f'{errors / count:.1%}' if count else '-'
@@ -0,0 +1,61 @@
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a WSGI worker does before serving its first request
+STARTUP_SCRIPT = (
+    'import django; django.setup(); '
+    'from django.core.wsgi import get_wsgi_application; get_wsgi_application(); '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)$')
+
+class Command(BaseCommand):
+    help = 'Measures worker cold start per runtime profile, with import time per module from python -X importtime.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', dest='profiles', help='Runtime profile to measure (repeatable, default: full and api).')
+        parser.add_argument('--top', type=int, default=15, help='Number of slowest modules to list.')
+        parser.add_argument('--runs', type=int, default=3, help='Runs per profile; the fastest is reported.')
+
+    def handle(self, *args, **options):
+        for profile in options['profiles'] or ['full', 'api']:
+            runs = [self._measure(profile) for _ in range(options['runs'])]
+            wall, modules = min(runs, key=lambda run: run[0])
+            total = sum(self_us for self_us, _ in modules.values())
+
+            self.stdout.write(self.style.SUCCESS(
+                f'[{profile}] {wall * 1000:.0f} ms wall, {total / 1000:.0f} ms importing {len(modules)} modules'
+            ))
+            self.stdout.write(f"{'self ms':>9} {'cumul ms':>9}  module")
+            slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:options['top']]
+            for module, (self_us, cumulative_us) in slowest:
+                self.stdout.write(f'{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {module}')
+
+    def _measure(self, profile):
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'instahyre_test.settings'),
+            DJANGO_RUNTIME_PROFILE=profile,
+        )
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        wall = time.perf_counter() - start
+        if result.returncode != 0:
+            raise CommandError(f'Startup failed for profile {profile}:\n{result.stderr[-2000:]}')
+
+        modules = {}
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                modules[match.group(3)] = (int(match.group(1)), int(match.group(2)))
+        return wall, modules
@@ -1,5 +1,4 @@
 import random
-from faker import Faker
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.contrib.auth.hashers import make_password
@@ -7,9 +6,6 @@ from django.contrib.auth.hashers import make_password
 from auth_user.models import User
 from api.models import Contact, SpamReport
 
-# Initialize Faker
-fake = Faker('en_IN') # 'en_IN' = for Indian names/numbers
-
 # Configuration for data population
 NUM_USERS = 20
 NUM_CONTACTS_PER_USER_MIN = 5
@@ -24,6 +20,10 @@ class Command(BaseCommand):
 
     @transaction.atomic # Ensure all or nothing operation
     def handle(self, *args, **kwargs):
+        # Imported here so that loading management commands does not import Faker
+        from faker import Faker
+        self.fake = fake = Faker('en_IN') # 'en_IN' = for Indian names/numbers
+
         self.stdout.write(self.style.SUCCESS('Start generating data for population...'))
 
         # ---Start: To Clear existing data ---
@@ -178,4 +178,4 @@ class Command(BaseCommand):
                     return phone
         
         # Fallback if many attempts fail
-        return fake.unique.numerify(text='##########') # Generic 10-digits
\ No newline at end of file
+        return self.fake.unique.numerify(text='##########') # Generic 10-digits
\ No newline at end of file
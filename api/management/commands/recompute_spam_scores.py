@@ -0,0 +1,175 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from api.models import SpamCounterStripe, SpamReport, SpamScore
+from api.utils import get_report_counts, spam_likelihood_from_count
+
+# Bounds of the score histogram printed by --dry-run
+HISTOGRAM_BINS = [0, 0.01, 10, 20, 30, 40, 50, 60, 70, 80, 90, 99.99, 100.01]
+LOOKUP_BATCH_SIZE = 5000
+
+
+def rebase_on_reports(phone_numbers):
+    # Sets report_count of each number (creating missing rows) so that it plus the
+    # stripes equals its reports in SpamReport. Must run in a transaction. The stripe
+    # and score rows are locked first, in the order compact_spam_counters locks them,
+    # so a running compaction commits before the UPDATE takes its snapshot; otherwise
+    # it would subtract stripes compaction had just folded in. The UPDATE then reads
+    # SpamReport and the stripes in one snapshot, so a report committed meanwhile is
+    # counted in both or in neither; the stripes are left for compaction.
+    reports = SpamReport.objects.filter(phone_number=OuterRef('phone_number')).order_by().values(
+        'phone_number'
+    ).annotate(n=Count('id')).values('n')
+    pending = SpamCounterStripe.objects.filter(phone_number=OuterRef('phone_number')).order_by().values(
+        'phone_number'
+    ).annotate(n=Sum('count')).values('n')
+    list(SpamCounterStripe.objects.select_for_update().filter(phone_number__in=phone_numbers).values_list('id', flat=True))
+    SpamScore.objects.bulk_create([SpamScore(phone_number=phone) for phone in phone_numbers], ignore_conflicts=True)
+    list(SpamScore.objects.select_for_update().filter(phone_number__in=phone_numbers).values_list('id', flat=True))
+    return SpamScore.objects.filter(phone_number__in=phone_numbers).update(
+        report_count=Coalesce(Subquery(reports), 0) - Coalesce(Subquery(pending), 0),
+        updated_at=timezone.now(),
+    )
+
+
+class Command(BaseCommand):
+    help = 'Recomputes every stored spam report count from SpamReport with vectorized NumPy group-bys.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Reports read per chunk.')
+        parser.add_argument('--max-reports', type=int, default=None, help='With --dry-run: threshold for 100%% spam likelihood to try (defaults to SPAM_MAX_REPORTS_FOR_HIGH_SPAM).')
+        parser.add_argument('--dry-run', action='store_true', help='Only print how the spam likelihood distribution would change.')
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+        except ImportError:
+            raise CommandError('recompute_spam_scores needs NumPy: pip install numpy')
+        if options['max_reports'] and not options['dry_run']:
+            # Likelihoods are computed on read from SPAM_MAX_REPORTS_FOR_HIGH_SPAM, so
+            # another threshold can only be previewed; change the setting to apply it.
+            raise CommandError('--max-reports only applies to --dry-run.')
+        self.np = np
+        self.max_reports = options['max_reports'] or settings.SPAM_MAX_REPORTS_FOR_HIGH_SPAM
+        self.dry_run = options['dry_run']
+        self.old_scores, self.new_scores = [], []
+        self.numbers = self.changed = self.existing = 0
+
+        # Ordered by number (the index), so every number's reports are contiguous and
+        # only the group at the end of a chunk has to wait for the next chunk.
+        # The score only depends on distinct reporters, so reported_at is not read.
+        reports = SpamReport.objects.order_by('phone_number').values_list(
+            'phone_number', 'reported_by_id'
+        ).iterator(chunk_size=options['chunk_size'])
+
+        phones, reporters = [], []
+        flush_at = options['chunk_size']
+        for phone_number, reporter_id in reports:
+            phones.append(phone_number)
+            reporters.append(reporter_id)
+            if len(phones) >= flush_at:
+                phones, reporters = self._process_chunk(phones, reporters, final=False)
+                flush_at = len(phones) + options['chunk_size']
+        self._process_chunk(phones, reporters, final=True)
+
+        if self.dry_run:
+            self._print_diff()
+            return
+
+        # Numbers with a count or stripes but no reports left were not seen above:
+        # rebase them too, and drop the rows that are back to zero with no stripes left
+        reported = SpamReport.objects.values('phone_number')
+        gone = sorted(
+            set(SpamScore.objects.exclude(phone_number__in=reported).values_list('phone_number', flat=True))
+            | set(SpamCounterStripe.objects.exclude(phone_number__in=reported).values_list('phone_number', flat=True))
+        )
+        removed = 0
+        for i in range(0, len(gone), LOOKUP_BATCH_SIZE):
+            batch = gone[i:i + LOOKUP_BATCH_SIZE]
+            with transaction.atomic():
+                rebase_on_reports(batch)
+                removed += SpamScore.objects.filter(phone_number__in=batch, report_count=0).exclude(
+                    phone_number__in=SpamCounterStripe.objects.values('phone_number')
+                ).delete()[0]
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed report counts for {self.numbers} numbers ({self.changed} changed, {removed} removed).'
+        ))
+
+    def _process_chunk(self, phones, reporters, final):
+        np = self.np
+        if not phones:
+            return [], []
+        phones_arr = np.array(phones, dtype=str)
+        reporters_arr = np.array(reporters, dtype=np.int64)
+
+        # Sort by (number, reporter) so duplicate reporters are adjacent, then count
+        # distinct reporters per number with one reduceat over the group starts.
+        order = np.lexsort((reporters_arr, phones_arr))
+        phones_arr, reporters_arr = phones_arr[order], reporters_arr[order]
+        new_phone = np.empty(len(phones_arr), dtype=bool)
+        new_phone[0] = True
+        new_phone[1:] = phones_arr[1:] != phones_arr[:-1]
+        new_reporter = new_phone.copy()
+        new_reporter[1:] |= reporters_arr[1:] != reporters_arr[:-1]
+        starts = np.flatnonzero(new_phone)
+
+        carry = ([], [])
+        if not final:
+            # The last number may continue in the next chunk
+            last = starts[-1]
+            carry = (phones_arr[last:].tolist(), reporters_arr[last:].tolist())
+            starts = starts[:-1]
+            if not len(starts):
+                return carry
+            new_reporter = new_reporter[:last]
+
+        counts = np.add.reduceat(new_reporter.astype(np.int64), starts)
+        scores = np.where(
+            counts >= self.max_reports, 100.0, np.round(counts / self.max_reports * 100, 2)
+        )
+        self._store(phones_arr[starts].tolist(), counts.tolist(), scores.tolist())
+        return carry
+
+    def _store(self, phone_numbers, counts, scores):
+        # Current live counts (compacted count plus stripes)
+        old = {}
+        for i in range(0, len(phone_numbers), LOOKUP_BATCH_SIZE):
+            batch = phone_numbers[i:i + LOOKUP_BATCH_SIZE]
+            old.update(get_report_counts(batch))
+            self.existing += SpamScore.objects.filter(phone_number__in=batch).count()
+
+        self.numbers += len(phone_numbers)
+        if self.dry_run:
+            old_scores = [spam_likelihood_from_count(old[phone]) for phone in phone_numbers]
+            self.changed += sum(1 for old_score, score in zip(old_scores, scores) if old_score != score)
+            self.old_scores.extend(old_scores)
+            self.new_scores.extend(scores)
+            return
+        changed = [phone for phone, count in zip(phone_numbers, counts) if old[phone] != count]
+        self.changed += len(changed)
+
+        # Reports may be added or deleted since the chunk was read, so the counts above
+        # only pick the numbers to fix; the written count is re-read by the UPDATE itself.
+        for i in range(0, len(changed), LOOKUP_BATCH_SIZE):
+            batch = changed[i:i + LOOKUP_BATCH_SIZE]
+            with transaction.atomic():
+                rebase_on_reports(batch)
+
+    def _print_diff(self):
+        np = self.np
+        orphaned = SpamScore.objects.count() - self.existing
+        old_hist, _ = np.histogram(np.array(self.old_scores, dtype=float), bins=HISTOGRAM_BINS)
+        new_hist, _ = np.histogram(np.array(self.new_scores, dtype=float), bins=HISTOGRAM_BINS)
+
+        self.stdout.write(f'Dry run with a threshold of {self.max_reports} reports: '
+                          f'{self.numbers} numbers, {self.changed} likelihoods would change.')
+        self.stdout.write(f"{'likelihood':>12} {'current':>9} {'new':>9} {'diff':>9}")
+        labels = ['0'] + [f'{lo:g}-{hi:g}' for lo, hi in zip([0] + HISTOGRAM_BINS[2:-2], HISTOGRAM_BINS[2:-1])] + ['100']
+        for label, old_count, new_count in zip(labels, old_hist, new_hist):
+            self.stdout.write(f'{label:>12} {old_count:9d} {new_count:9d} {new_count - old_count:+9d}')
+        if orphaned:
+            self.stdout.write(f'{orphaned} stored counts have no reports and would be removed.')
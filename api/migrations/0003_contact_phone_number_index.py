@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_normalize_existing_phones'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contact',
+            name='phone_number',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:53
+
+from django.db import migrations, models
+
+
+def count_existing_names(apps, schema_editor):
+    Contact = apps.get_model('api', 'Contact')
+    ContactNameCount = apps.get_model('api', 'ContactNameCount')
+    counts = (
+        Contact.objects.order_by()
+        .values_list('phone_number', 'name')
+        .annotate(count=models.Count('id'))
+    )
+    ContactNameCount.objects.bulk_create(
+        (ContactNameCount(phone_number=phone_number, name=name, count=count) for phone_number, name, count in counts.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactNameCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(max_length=20)),
+                ('name', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['phone_number', '-count'], name='api_namecount_phone_count_idx')],
+                'unique_together': {('phone_number', 'name')},
+            },
+        ),
+        migrations.RunPython(count_existing_names, migrations.RunPython.noop),
+    ]
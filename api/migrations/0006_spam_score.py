@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def score_existing_reports(apps, schema_editor):
+    SpamReport = apps.get_model('api', 'SpamReport')
+    SpamScore = apps.get_model('api', 'SpamScore')
+    max_reports = getattr(settings, 'SPAM_MAX_REPORTS_FOR_HIGH_SPAM', 10)
+    counts = SpamReport.objects.order_by().values_list('phone_number').annotate(report_count=models.Count('id'))
+    SpamScore.objects.bulk_create(
+        (
+            SpamScore(
+                phone_number=phone_number,
+                report_count=report_count,
+                score=100.0 if report_count >= max_reports else round(report_count / max_reports * 100, 2),
+            )
+            for phone_number, report_count in counts.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_contact_name_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpamScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(max_length=20, unique=True)),
+                ('report_count', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(score_existing_reports, migrations.RunPython.noop),
+    ]
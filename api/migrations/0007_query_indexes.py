@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_spam_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='contact',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='spamreport',
+            options={},
+        ),
+        migrations.AlterField(
+            model_name='spamreport',
+            name='phone_number',
+            field=models.CharField(max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='spamreport',
+            index=models.Index(fields=['phone_number', 'reported_at'], name='api_spamreport_phone_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spamreport',
+            index=models.Index(fields=['reported_at'], name='api_spamreport_at_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_spam_counter_stripes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['phone_number', 'id'], name='api_changeevent_phone_id_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:17
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_change_event_phone_index'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='spamscore',
+            name='score',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_remove_spam_score_value'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='spamscore',
+            name='report_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,13 @@
+from django.db import router, transaction
+
+
+class AtomicSaveMixin:
+    """
+    Runs save() and its post_save receivers in one transaction, so the change feed
+    entry is committed together with the row (deletes are already atomic).
+    """
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
@@ -1,14 +1,16 @@
 from django.db import models
 from django.conf import settings
 
-class Contact(models.Model):
+from .mixins import AtomicSaveMixin
+
+class Contact(AtomicSaveMixin, models.Model):
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         related_name='contacts',
         on_delete=models.CASCADE
     )
     name = models.CharField(max_length=255) 
-    phone_number = models.CharField(max_length=20)
+    phone_number = models.CharField(max_length=20, db_index=True)
     
     registered_user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -22,14 +24,15 @@ class Contact(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        # No default ordering: it added a sort to every contact query, including the
+        # exact-number lookups. Views order explicitly where they need to.
         unique_together = ('owner', 'phone_number')
-        ordering = ['name']
 
     def __str__(self):
         return f"{self.name} ({self.phone_number}) - owned by {self.owner.phone_number}"
 
-class SpamReport(models.Model): 
-    phone_number = models.CharField(max_length=20, db_index=True)
+class SpamReport(AtomicSaveMixin, models.Model): 
+    phone_number = models.CharField(max_length=20)
 
     # The user who reported this number as spam.
     reported_by = models.ForeignKey(
@@ -43,7 +46,87 @@ class SpamReport(models.Model):
     class Meta:
         # A condition so that a user cannot report the same number multiple times
         unique_together = ('phone_number', 'reported_by')
-        ordering = ['-reported_at']
+        indexes = [
+            # Reports for a number by time; also covers plain phone_number lookups
+            models.Index(fields=['phone_number', 'reported_at'], name='api_spamreport_phone_at_idx'),
+            # Time-window scans when the spam trends are loaded
+            models.Index(fields=['reported_at'], name='api_spamreport_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.phone_number} reported by {self.reported_by.phone_number}"
+
+class SpamScore(models.Model):
+    # Compacted report count per reported number. New reports go to SpamCounterStripe
+    # and are folded in by compact_spam_counters, so the live count is report_count plus
+    # the stripes; the spam likelihood is computed from it on read (api.utils).
+    # recompute_spam_scores rebuilds it from SpamReport without touching the stripes,
+    # so report_count can be negative while stripes still hold reports deleted since.
+    phone_number = models.CharField(max_length=20, unique=True)
+    report_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.phone_number}: {self.report_count} reports"
+
+class SpamCounterStripe(models.Model):
+    # One of SPAM_COUNTER_STRIPES sub-counters per number, picked by reporter id, so
+    # concurrent reports for the same number update different rows. count may be
+    # negative when a report is deleted before compaction.
+    phone_number = models.CharField(max_length=20)
+    stripe = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('phone_number', 'stripe')
+
+    def __str__(self):
+        return f"{self.phone_number}[{self.stripe}]: {self.count}"
+
+class ContactNameCount(models.Model):
+    # How many contacts save a number under each name, kept up to date on every
+    # Contact write, so the most common names for a number are one indexed read.
+    phone_number = models.CharField(max_length=20)
+    name = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('phone_number', 'name')
+        indexes = [
+            models.Index(fields=['phone_number', '-count'], name='api_namecount_phone_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.phone_number}) x{self.count}"
+
+class ChangeEvent(models.Model):
+    # Transactional outbox: one row per write to User, Contact or SpamReport, added in
+    # the same transaction as the write. Consumers read it by increasing id.
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [(CREATED, 'Created'), (UPDATED, 'Updated'), (DELETED, 'Deleted')]
+
+    model = models.CharField(max_length=32) # model_name of the changed row, e.g. 'contact'
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=8, choices=ACTION_CHOICES)
+    phone_number = models.CharField(max_length=20)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Phone snapshot lookups: has this number changed since the export?
+            models.Index(fields=['phone_number', 'id'], name='api_changeevent_phone_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.model} {self.object_id} {self.action}"
+
+class ChangeFeedCursor(models.Model):
+    # Last event id processed by each named consumer, used for compaction
+    name = models.CharField(max_length=64, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.phone_number} reported by {self.reported_by.phone_number}"
\ No newline at end of file
+        return f"{self.name} at #{self.position}"
@@ -0,0 +1,34 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import ContactNameCount
+
+
+def add_contact_name(phone_number, name):
+    counts = ContactNameCount.objects.filter(phone_number=phone_number, name=name)
+    if counts.update(count=F('count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            ContactNameCount.objects.create(phone_number=phone_number, name=name, count=1)
+    except IntegrityError:
+        # Another writer created the row first
+        counts.update(count=F('count') + 1)
+
+
+def remove_contact_name(phone_number, name):
+    counts = ContactNameCount.objects.filter(phone_number=phone_number, name=name)
+    if not counts.filter(count__gt=1).update(count=F('count') - 1):
+        counts.delete()
+
+
+def get_name_summary(phone_number, size=5):
+    """
+    The `size` most common names saved for a number as [{'name', 'count'}], and the
+    total number of contacts holding it.
+    """
+    counts = ContactNameCount.objects.filter(phone_number=phone_number)
+    names = list(counts.order_by('-count', 'name').values('name', 'count')[:size])
+    if len(names) < size:
+        return names, sum(n['count'] for n in names)
+    return names, counts.aggregate(total=Sum('count'))['total']
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import ChangeEvent, ChangeFeedCursor
+from .snapshot import SNAPSHOT_CURSOR
+
+# Change feed readers. Events are written by the post_save/post_delete receivers in
+# api.signals; bulk_create() and QuerySet.update() bypass those and are not recorded.
+#
+# Ids are allocated at insert time, so on databases with concurrent writers an event
+# with a lower id can commit after one with a higher id. Consumers that need to be
+# exact there should pass settle_seconds to leave the newest events for the next poll.
+
+
+def read_changes(after_id=0, limit=500, settle_seconds=0):
+    events = ChangeEvent.objects.filter(id__gt=after_id)
+    if settle_seconds:
+        events = events.filter(created_at__lte=timezone.now() - timedelta(seconds=settle_seconds))
+    return list(events.order_by('id')[:limit])
+
+
+def consume_changes(consumer, handler, batch_size=500, settle_seconds=0):
+    """
+    Passes every event after the consumer's cursor to handler in batches and moves
+    the cursor after each batch, so a failed handler retries from that batch.
+    Returns the number of events handled.
+    """
+    cursor, _ = ChangeFeedCursor.objects.get_or_create(name=consumer)
+    handled = 0
+    while True:
+        batch = read_changes(cursor.position, batch_size, settle_seconds)
+        if not batch:
+            return handled
+        handler(batch)
+        cursor.position = batch[-1].id
+        cursor.save(update_fields=['position', 'updated_at'])
+        handled += len(batch)
+
+
+def compact_changes(max_age=None):
+    """
+    Deletes events every consumer has processed, plus events older than max_age
+    (a timedelta) so a consumer that stopped cannot grow the table forever. Events
+    the current phone snapshot depends on are always kept.
+    Returns the number of deleted events.
+    """
+    processed = ChangeFeedCursor.objects.aggregate(position=Min('position'))['position']
+    deleted = 0
+    if processed:
+        deleted += ChangeEvent.objects.filter(id__lte=processed).delete()[0]
+    if max_age is not None:
+        old_events = ChangeEvent.objects.filter(created_at__lt=timezone.now() - max_age)
+        # The phone snapshot is only correct while the events after its export exist
+        snapshot_position = ChangeFeedCursor.objects.filter(name=SNAPSHOT_CURSOR).values_list('position', flat=True).first()
+        if snapshot_position is not None:
+            old_events = old_events.filter(id__lte=snapshot_position)
+        deleted += old_events.delete()[0]
+    return deleted
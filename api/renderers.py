@@ -0,0 +1,22 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(BaseRenderer):
+    # Newline-delimited JSON, one result per line
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        return ''.join(self.render_line(item) for item in data).encode(self.charset)
+
+    @staticmethod
+    def render_line(item):
+        return json.dumps(item, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
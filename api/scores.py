@@ -0,0 +1,80 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SpamCounterStripe, SpamScore
+
+
+def stripe_for(reporter_id, stripes=None):
+    return reporter_id % (stripes or settings.SPAM_COUNTER_STRIPES)
+
+
+def _adjust_report_count(phone_number, reporter_id, delta):
+    # Runs inside the SpamReport write's transaction (see api.signals). Reports from
+    # different reporters mostly land on different stripe rows, so they do not queue
+    # on one row lock the way a single per-number counter does.
+    stripe = stripe_for(reporter_id)
+    counter = SpamCounterStripe.objects.filter(phone_number=phone_number, stripe=stripe)
+    if counter.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            SpamCounterStripe.objects.create(phone_number=phone_number, stripe=stripe, count=delta)
+    except IntegrityError:
+        # Another report created the row first
+        counter.update(count=F('count') + delta)
+
+
+def add_spam_report(phone_number, reporter_id):
+    _adjust_report_count(phone_number, reporter_id, 1)
+
+
+def remove_spam_report(phone_number, reporter_id):
+    _adjust_report_count(phone_number, reporter_id, -1)
+
+
+def compact_spam_counters(batch_size=500):
+    # Folds the stripes into SpamScore, one batch of numbers per transaction, and
+    # returns how many numbers were compacted. Locked stripe rows make concurrent
+    # reports wait until the batch commits; they then create fresh stripes.
+    compacted = 0
+    while True:
+        with transaction.atomic():
+            phone_numbers = list(
+                SpamCounterStripe.objects.order_by('phone_number')
+                .values_list('phone_number', flat=True).distinct()[:batch_size]
+            )
+            if not phone_numbers:
+                return compacted
+
+            stripes = SpamCounterStripe.objects.select_for_update().filter(phone_number__in=phone_numbers)
+            deltas = defaultdict(int)
+            stripe_ids = []
+            for stripe_id, phone_number, count in stripes.values_list('id', 'phone_number', 'count'):
+                deltas[phone_number] += count
+                stripe_ids.append(stripe_id)
+
+            counts = dict(
+                SpamScore.objects.select_for_update().filter(phone_number__in=phone_numbers)
+                .values_list('phone_number', 'report_count')
+            )
+            now = timezone.now()
+            scores = [
+                SpamScore(
+                    phone_number=phone_number,
+                    report_count=counts.get(phone_number, 0) + delta,
+                    updated_at=now,
+                )
+                for phone_number, delta in deltas.items()
+            ]
+            SpamScore.objects.bulk_create(
+                scores,
+                update_conflicts=True,
+                unique_fields=['phone_number'],
+                update_fields=['report_count', 'updated_at'],
+            )
+            SpamCounterStripe.objects.filter(id__in=stripe_ids).delete()
+            compacted += len(scores)
@@ -61,6 +61,10 @@ class SearchResultSerializer(serializers.Serializer):
             phone = obj.get('phone_number')
         
         if phone:
+            # Views that already fetched scores in bulk pass them through the context
+            spam_likelihoods = self.context.get('spam_likelihoods')
+            if spam_likelihoods is not None and phone in spam_likelihoods:
+                return spam_likelihoods[phone]
             return get_spam_likelihood(phone)
         return 0.0
 
@@ -91,4 +95,13 @@ class SearchResultSerializer(serializers.Serializer):
             # if the searching user exists in the contact list of the same.
             if Contact.objects.filter(owner=target_user_instance, phone_number=requesting_user.phone_number).exists():
                 return target_email
-        return None # Otherwise, do not show email
\ No newline at end of file
+        return None # Otherwise, do not show email
+
+class NameCountSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    count = serializers.IntegerField()
+
+class PhoneNameSummarySerializer(SearchResultSerializer):
+    # Unregistered number: the most common saved name, plus the top names with counts
+    names = NameCountSerializer(many=True)
+    total_contacts = serializers.IntegerField()
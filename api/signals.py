@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from auth_user.models import User
+from .models import ChangeEvent, Contact, SpamReport
+from .hotnumbers import unpin_number
+from .names import add_contact_name, remove_contact_name
+from .scores import add_spam_report, remove_spam_report
+from .typeahead import bump_generation
+
+# Saves that do not change anything a consumer of the change feed looks at
+IGNORED_USER_FIELDS = {'password', 'last_login'}
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Contact)
+@receiver([post_save, post_delete], sender=SpamReport)
+def phone_number_changed(sender, instance, **kwargs):
+    # Its pinned payload is dropped until the next warm-up. (Phone snapshot lookups
+    # skip numbers with change events newer than the export, see api.snapshot.)
+    unpin_number(instance.phone_number)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Contact)
+@receiver(post_save, sender=SpamReport)
+def record_save(sender, instance, created, update_fields=None, **kwargs):
+    if sender is User and update_fields and set(update_fields) <= IGNORED_USER_FIELDS:
+        return
+    ChangeEvent.objects.create(
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        action=ChangeEvent.CREATED if created else ChangeEvent.UPDATED,
+        phone_number=instance.phone_number,
+    )
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Contact)
+@receiver(post_delete, sender=SpamReport)
+def record_delete(sender, instance, **kwargs):
+    ChangeEvent.objects.create(
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        action=ChangeEvent.DELETED,
+        phone_number=instance.phone_number,
+    )
+
+
+@receiver(pre_save, sender=Contact)
+def remember_contact_name(sender, instance, **kwargs):
+    instance._previous_name_key = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous_name_key = Contact.objects.filter(pk=instance.pk).values_list('phone_number', 'name').first()
+
+
+@receiver(post_save, sender=Contact)
+def count_contact_name(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_name_key', None)
+    current = (instance.phone_number, instance.name)
+    if previous == current:
+        return
+    if previous is not None:
+        remove_contact_name(*previous)
+    add_contact_name(*current)
+
+
+@receiver(post_delete, sender=Contact)
+def uncount_contact_name(sender, instance, **kwargs):
+    remove_contact_name(instance.phone_number, instance.name)
+
+
+@receiver(post_save, sender=SpamReport)
+def count_spam_report(sender, instance, created, **kwargs):
+    if created:
+        add_spam_report(instance.phone_number, instance.reported_by_id)
+
+
+@receiver(post_delete, sender=SpamReport)
+def uncount_spam_report(sender, instance, **kwargs):
+    remove_spam_report(instance.phone_number, instance.reported_by_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Contact)
+def invalidate_typeahead(sender, instance, update_fields=None, **kwargs):
+    if sender is User and update_fields and set(update_fields) <= IGNORED_USER_FIELDS:
+        return
+    # After commit, so no request can cache pre-write rows under the new generation
+    transaction.on_commit(bump_generation)
@@ -0,0 +1,193 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ChangeEvent, ChangeFeedCursor
+
+# Columnar phone lookup snapshot, written by the export_phone_snapshot command.
+#
+#   header   magic, version, number width, number count, entry count, created_at,
+#            change position (last ChangeEvent id already reflected in the file)
+#   numbers  count x width bytes, sorted, NUL padded canonical numbers
+#   meta     count x (first entry, entry count, spam report count)
+#   entries  entry count x (registered user id or 0, name offset/length, email offset/length)
+#   blob     UTF-8 names and emails referenced by the entries
+#
+# Each number carries the rows SearchByPhoneView would return for it: the
+# registered user alone, or else every contact entry saved with that number.
+# Numbers with a ChangeEvent after the change position are looked up in the
+# database instead, in every process, until the next export.
+
+MAGIC = b'PHSNAP01'
+VERSION = 2
+NUMBER_WIDTH = 20
+HEADER = struct.Struct('<8sIIIIdQ')
+META = struct.Struct('<III')
+ENTRY = struct.Struct('<QIIII')
+
+# Change feed cursor holding the change position of the latest export, so compaction
+# keeps every event the snapshot still depends on
+SNAPSHOT_CURSOR = 'phone-snapshot'
+
+# Events created this recently may belong to transactions that had not committed when
+# the export read the tables, so they are left above the change position
+CHANGE_SETTLE_SECONDS = 60
+
+
+def encode_number(phone_number):
+    try:
+        encoded = phone_number.encode('ascii')
+    except UnicodeEncodeError:
+        return None
+    if not encoded or len(encoded) > NUMBER_WIDTH:
+        return None
+    return encoded.ljust(NUMBER_WIDTH, b'\0')
+
+
+def write_snapshot(path, created_at, change_position, numbers):
+    """
+    numbers: iterable of (phone_number, spam_count, entries) where entries are
+    (registered user id or None, name, email or None) tuples.
+    """
+    keys, meta, entries = bytearray(), bytearray(), bytearray()
+    blob = bytearray()
+    rows = sorted(
+        (encoded, spam_count, number_entries)
+        for encoded, spam_count, number_entries in (
+            (encode_number(phone_number), spam_count, number_entries)
+            for phone_number, spam_count, number_entries in numbers
+        )
+        if encoded is not None
+    )
+    entry_count = 0
+    for encoded, spam_count, number_entries in rows:
+        keys += encoded
+        meta += META.pack(entry_count, len(number_entries), spam_count)
+        for user_id, name, email in number_entries:
+            name_bytes = name.encode('utf-8')
+            email_bytes = (email or '').encode('utf-8')
+            entries += ENTRY.pack(user_id or 0, len(blob), len(name_bytes), len(blob) + len(name_bytes), len(email_bytes))
+            blob += name_bytes + email_bytes
+        entry_count += len(number_entries)
+
+    # Write next to the target and rename, so readers never see a partial file
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, NUMBER_WIDTH, len(rows), entry_count, created_at, change_position))
+        f.write(keys)
+        f.write(meta)
+        f.write(entries)
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return len(rows), entry_count
+
+
+class PhoneSnapshot:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, width, self.count, self.entry_count,
+         self.created_at, self.change_position) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or width != NUMBER_WIDTH:
+            self._mm.close()
+            raise ValueError(f'{path} is not a version {VERSION} phone snapshot.')
+        self._numbers_at = HEADER.size
+        self._meta_at = self._numbers_at + self.count * NUMBER_WIDTH
+        self._entries_at = self._meta_at + self.count * META.size
+        self._blob_at = self._entries_at + self.entry_count * ENTRY.size
+
+    def close(self):
+        self._mm.close()
+
+    def _find(self, key):
+        # Binary search over the fixed-width numbers, straight from the mapping
+        mm, base = self._mm, self._numbers_at
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = base + mid * NUMBER_WIDTH
+            probe = mm[offset:offset + NUMBER_WIDTH]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def lookup(self, phone_number):
+        """
+        Returns (spam report count, [(registered user id or None, name, email), ...]),
+        with no entries for unknown numbers, or None if the number cannot be stored
+        in a snapshot at all and has to be looked up in the database.
+        """
+        key = encode_number(phone_number)
+        if key is None:
+            return None
+        index = self._find(key)
+        if index is None:
+            return 0, []
+
+        first, entry_count, spam_count = META.unpack_from(self._mm, self._meta_at + index * META.size)
+        entries = []
+        for i in range(first, first + entry_count):
+            user_id, name_at, name_len, email_at, email_len = ENTRY.unpack_from(
+                self._mm, self._entries_at + i * ENTRY.size
+            )
+            name = self._mm[self._blob_at + name_at:self._blob_at + name_at + name_len].decode('utf-8')
+            email = self._mm[self._blob_at + email_at:self._blob_at + email_at + email_len].decode('utf-8') or None
+            entries.append((user_id or None, name, email))
+        return spam_count, entries
+
+
+_snapshot = None
+_snapshot_state = (None, None)
+_snapshot_checked_at = 0.0
+_snapshot_lock = threading.Lock()
+
+# How often (seconds) to check whether the snapshot file was replaced
+SNAPSHOT_RELOAD_INTERVAL = 30
+
+
+def get_phone_snapshot():
+    """The snapshot at PHONE_SNAPSHOT_PATH, reopened when the file is replaced."""
+    global _snapshot, _snapshot_state, _snapshot_checked_at
+    path = getattr(settings, 'PHONE_SNAPSHOT_PATH', None)
+    if not path:
+        return None
+    now = time.monotonic()
+    if _snapshot_state[0] == path and now - _snapshot_checked_at < SNAPSHOT_RELOAD_INTERVAL:
+        return _snapshot
+    with _snapshot_lock:
+        _snapshot_checked_at = now
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if (path, mtime) != _snapshot_state:
+            # The old mapping is left to the garbage collector, requests may still be reading it
+            _snapshot = PhoneSnapshot(path) if mtime is not None else None
+            _snapshot_state = (path, mtime)
+    return _snapshot
+
+
+def current_change_position():
+    # Taken before the export reads the tables: every change after it is either in the
+    # file or has an event above it
+    settled = timezone.now() - timedelta(seconds=CHANGE_SETTLE_SECONDS)
+    return ChangeEvent.objects.filter(created_at__lt=settled).aggregate(position=Max('id'))['position'] or 0
+
+
+def save_change_position(change_position):
+    ChangeFeedCursor.objects.update_or_create(name=SNAPSHOT_CURSOR, defaults={'position': change_position})
+
+
+def number_changed_since(phone_number, change_position):
+    return ChangeEvent.objects.filter(phone_number=phone_number, id__gt=change_position).exists()
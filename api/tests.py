@@ -1 +1,386 @@
-from django.test import TestCase
+import importlib.util
+import io
+import json
+import re
+import shutil
+import tempfile
+from collections import Counter
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from auth_user.models import User
+from .models import ChangeEvent, Contact, ContactNameCount, SpamCounterStripe, SpamReport, SpamScore
+from .hotnumbers import HotNumbers
+from .scores import compact_spam_counters
+from .snapshot import PhoneSnapshot
+from .trending import SpamTrends
+from .views import SearchByNameView
+from .typeahead import TypeaheadCache, get_typeahead_cache, typeahead_enabled
+from .utils import get_report_counts
+
+# "SCAN <table>" in SQLite's EXPLAIN QUERY PLAN reads every row of the table (or of one of
+# its indexes, "SCAN <table> USING INDEX ..."). "SEARCH" is an index lookup. SQLite
+# before 3.36 prints "SCAN TABLE <table>".
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'query plans are checked on SQLite')
+class HotQueryPlanTests(TestCase):
+    # Name search is a substring match (icontains), which no B-tree index can serve, so
+    # scanning the user and contact tables is expected there and nowhere else.
+    name_search_scans = {'auth_user_user', 'api_contact'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(phone_number='+15550000001', name='Alice', password='pw-12345!')
+        cls.bob = User.objects.create_user(phone_number='+15550000002', name='Bob', password='pw-12345!')
+        Contact.objects.create(owner=cls.alice, name='Bobby', phone_number=cls.bob.phone_number, registered_user=cls.bob)
+        Contact.objects.create(owner=cls.alice, name='Spammer', phone_number='+15559999999')
+        Contact.objects.create(owner=cls.bob, name='Spam Co', phone_number='+15559999999')
+        SpamReport.objects.create(phone_number='+15559999999', reported_by=cls.bob)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def query_plan(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoFullScans(self, queries, allowed=()):
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            for detail in self.query_plan(sql):
+                match = FULL_SCAN.search(detail)
+                if match and match.group(1) not in allowed:
+                    self.fail(f'{detail!r} in query plan of:\n{sql}')
+
+    def assertQuerysetUsesIndexes(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        for detail in self.query_plan(sql, params):
+            self.assertIsNone(FULL_SCAN.search(detail), f'{detail!r} in query plan of:\n{sql}')
+
+    def captured(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 500)
+        return queries.captured_queries
+
+    def test_search_by_phone(self):
+        for phone in (self.bob.phone_number, '+15559999999', '+15550000404'):
+            self.assertNoFullScans(self.captured('get', '/api/search/phone/', {'phone': phone}))
+            self.assertNoFullScans(self.captured('get', '/api/search/phone/', {'phone': phone, 'full': '1'}))
+
+    def test_search_by_phone_prefix(self):
+        self.assertNoFullScans(self.captured('get', '/api/search/phone/prefix/', {'prefix': '+1555'}))
+
+    def test_search_by_name(self):
+        self.assertNoFullScans(
+            self.captured('get', '/api/search/name/', {'q': 'spam'}), allowed=self.name_search_scans
+        )
+
+    def test_mark_as_spam(self):
+        self.assertNoFullScans(self.captured('post', '/api/spam/mark/', {'phone_number': '+15558888888'}))
+
+    def test_profile(self):
+        self.assertNoFullScans(self.captured('get', '/auth/profile/'))
+        self.assertNoFullScans(self.captured('put', '/auth/profile/', {'name': 'Alice B', 'email': 'alice@example.com'}))
+
+    def test_background_queries(self):
+        since = timezone.now() - timedelta(days=7)
+        for queryset in (
+            # Spam trends warm-up and per-number report history
+            SpamReport.objects.filter(reported_at__gte=since).values_list('phone_number', 'reported_at'),
+            SpamReport.objects.filter(phone_number='+15559999999').order_by('reported_at'),
+            # Contacts touched when a user is deleted (CASCADE / SET_NULL)
+            Contact.objects.filter(owner=self.bob),
+            Contact.objects.filter(registered_user=self.bob),
+            # Scores, name summaries and the change feed
+            SpamScore.objects.filter(phone_number__in=['+15559999999', '+15550000002']),
+            ContactNameCount.objects.filter(phone_number='+15559999999').order_by('-count'),
+            ChangeEvent.objects.filter(id__gt=10).order_by('id'),
+        ):
+            with self.subTest(sql=str(queryset.query)):
+                self.assertQuerysetUsesIndexes(queryset)
+
+
+@override_settings(SPAM_COUNTER_STRIPES=4)
+class SpamCounterTests(TestCase):
+    numbers = ['+15551000001', '+15551000002', '+15551000003']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reporters = [
+            User.objects.create_user(phone_number=f'+1555200{i:04d}', name=f'Reporter {i}')
+            for i in range(10)
+        ]
+
+    def report(self, phone_number, reporters):
+        for reporter in reporters:
+            SpamReport.objects.create(phone_number=phone_number, reported_by=reporter)
+
+    def assertCountsMatchReports(self):
+        true_counts = Counter(SpamReport.objects.values_list('phone_number', flat=True))
+        self.assertEqual(
+            dict(get_report_counts(self.numbers)),
+            {phone_number: true_counts[phone_number] for phone_number in self.numbers},
+        )
+
+    def test_reports_and_deletes(self):
+        self.report(self.numbers[0], self.reporters)
+        self.report(self.numbers[1], self.reporters[:3])
+        self.assertGreater(SpamCounterStripe.objects.filter(phone_number=self.numbers[0]).count(), 1)
+        self.assertCountsMatchReports()
+
+        SpamReport.objects.filter(reported_by__in=self.reporters[:5]).delete()
+        self.assertCountsMatchReports()
+
+    def test_compaction(self):
+        self.report(self.numbers[0], self.reporters)
+        self.report(self.numbers[1], self.reporters[:3])
+        self.assertEqual(compact_spam_counters(batch_size=1), 2)
+        self.assertFalse(SpamCounterStripe.objects.exists())
+        self.assertCountsMatchReports()
+
+        # Deletes and new reports after a compaction go to fresh stripes
+        SpamReport.objects.filter(reported_by=self.reporters[0]).delete()
+        self.report(self.numbers[2], self.reporters[:2])
+        self.assertCountsMatchReports()
+        compact_spam_counters()
+        self.assertCountsMatchReports()
+        self.assertEqual(SpamScore.objects.get(phone_number=self.numbers[0]).report_count, 9)
+
+    @skipUnless(importlib.util.find_spec('numpy'), 'recompute_spam_scores needs NumPy')
+    def test_recompute(self):
+        self.report(self.numbers[0], self.reporters)
+        self.report(self.numbers[1], self.reporters[:3])
+        compact_spam_counters()
+        self.report(self.numbers[2], self.reporters[:4])
+        # Counts that drifted from the reports, e.g. after bulk deletes
+        SpamScore.objects.filter(phone_number=self.numbers[0]).update(report_count=3)
+        SpamScore.objects.create(phone_number='+15551000009', report_count=7)
+        SpamCounterStripe.objects.create(phone_number='+15551000008', stripe=0, count=2)
+
+        call_command('recompute_spam_scores', chunk_size=4, stdout=io.StringIO())
+        self.assertCountsMatchReports()
+        self.assertEqual(get_report_counts(['+15551000008', '+15551000009']), {'+15551000008': 0, '+15551000009': 0})
+        self.assertFalse(SpamScore.objects.filter(phone_number='+15551000009').exists())
+        # Pending stripes are rebased on, not deleted, so concurrent reports are kept
+        self.assertTrue(SpamCounterStripe.objects.filter(phone_number=self.numbers[2]).exists())
+        compact_spam_counters()
+        self.assertCountsMatchReports()
+
+    @skipUnless(importlib.util.find_spec('numpy'), 'recompute_spam_scores needs NumPy')
+    def test_recompute_during_compaction(self):
+        self.report(self.numbers[0], self.reporters)
+        self.report(self.numbers[1], self.reporters[:3])
+        SpamScore.objects.create(phone_number=self.numbers[0], report_count=2)
+
+        # Compaction folds the stripes in after the reports were counted, before the write
+        def counts_then_compact(phone_numbers):
+            counts = get_report_counts(phone_numbers)
+            compact_spam_counters()
+            return counts
+
+        with mock.patch('api.management.commands.recompute_spam_scores.get_report_counts', counts_then_compact):
+            call_command('recompute_spam_scores', stdout=io.StringIO())
+        self.assertCountsMatchReports()
+
+    @skipUnless(importlib.util.find_spec('numpy'), 'recompute_spam_scores needs NumPy')
+    def test_recompute_threshold_is_dry_run_only(self):
+        with self.assertRaises(CommandError):
+            call_command('recompute_spam_scores', max_reports=5, stdout=io.StringIO())
+        call_command('recompute_spam_scores', max_reports=5, dry_run=True, stdout=io.StringIO())
+
+
+class HotNumbersTests(TestCase):
+    def test_writes_unpin(self):
+        hot_numbers = HotNumbers(loader=lambda phone_number: f'payload {phone_number}', top_n=2)
+        for phone_number in ('+15553000001', '+15553000002', '+15553000002'):
+            hot_numbers.record(phone_number)
+        hot_numbers.warm()
+        self.assertEqual(hot_numbers.get_pinned('+15553000002'), 'payload +15553000002')
+
+        # A write through another process only leaves its change event behind
+        ChangeEvent.objects.create(model='contact', object_id=1, action=ChangeEvent.CREATED, phone_number='+15553000002')
+        self.assertIsNone(hot_numbers.get_pinned('+15553000002'))
+        self.assertEqual(hot_numbers.get_pinned('+15553000001'), 'payload +15553000001')
+
+
+class SpamTrendsTests(SimpleTestCase):
+    def test_windows(self):
+        now = [60 * 60 * 24 * 365]
+        trends = SpamTrends(windows={'hour': 60, 'day': 60 * 24}, clock=lambda: now[0])
+        for phone_number in ('+3', '+2', '+1', '+2', '+4', '+4', '+4'):
+            trends.record(phone_number)
+        self.assertEqual(trends.top('hour', 3), [('+4', 3), ('+2', 2), ('+1', 1)])
+
+        now[0] += 30 * 60
+        trends.record('+1')
+        trends.record('+1')
+        self.assertEqual(trends.top('hour', 2), [('+1', 3), ('+4', 3)])
+
+        # The first reports slide out of the hour, but not out of the day
+        now[0] += 45 * 60
+        self.assertEqual(trends.top('hour'), [('+1', 2)])
+        self.assertEqual(trends.top('day', 10), [('+1', 3), ('+4', 3), ('+2', 2), ('+3', 1)])
+
+
+class TypeaheadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The cache is only used with a generation counter shared between processes
+        cache_dir = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        cls.shared_cache = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir},
+        })
+        cls.shared_cache.enable()
+        cls.addClassCleanup(cls.shared_cache.disable)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(phone_number='+15554000001', name='Alice', password='pw-12345!')
+        rajesh = User.objects.create_user(phone_number='+15554000002', name='Rajesh', password='pw-12345!')
+        User.objects.create_user(phone_number='+15554000003', name='Ravi Raj', password='pw-12345!')
+        Contact.objects.create(owner=cls.alice, name='Rajesh', phone_number=rajesh.phone_number, registered_user=rajesh)
+        Contact.objects.create(owner=cls.alice, name='Raja Plumber', phone_number='+15554000009')
+        Contact.objects.create(owner=rajesh, name='Sara Jones', phone_number='+15554000008')
+        Contact.objects.create(owner=rajesh, name='Tara', phone_number='+15554000007')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def search(self, query):
+        response = self.client.get('/api/search/name/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_extended_query_matches_fresh_search(self):
+        typeahead_cache = get_typeahead_cache()
+        self.search('ra')
+        for query in ('raj', 'RAJA', 'ar', 'ra'):
+            with self.subTest(query=query):
+                hits = typeahead_cache.hits
+                cached = self.search(query)
+                if query != 'ar':
+                    self.assertEqual(typeahead_cache.hits, hits + 1)
+                with override_settings(TYPEAHEAD_CACHE_TTL=0):
+                    self.assertEqual(cached, self.search(query))
+
+    def test_writes_drop_cached_results(self):
+        self.search('ra')
+        with self.captureOnCommitCallbacks(execute=True):
+            Contact.objects.create(owner=self.alice, name='Ranjit', phone_number='+15554000006')
+        self.assertIn('Ranjit', [r['name'] for r in self.search('ran')])
+
+    def test_off_without_shared_cache(self):
+        self.assertTrue(typeahead_enabled())
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertFalse(typeahead_enabled())
+
+    def test_generation(self):
+        typeahead_cache = TypeaheadCache()
+        results = [{'name': 'Rajesh'}, {'name': 'Ravi Raj'}]
+        typeahead_cache.put(1, 'ra', 7, results)
+        self.assertEqual(typeahead_cache.get(1, 'ra', 7), results)
+        self.assertEqual([r['name'] for r in typeahead_cache.get(1, 'raj', 7)], ['Rajesh', 'Ravi Raj'])
+        self.assertIsNone(typeahead_cache.get(1, 'raj', 8))
+        # Entries from the old generation are dropped, not only skipped
+        self.assertIsNone(typeahead_cache.get(1, 'ra', 7))
+
+
+class NameSearchStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(phone_number='+15556000001', name='Alice', password='pw-12345!')
+        # Mixed case and non-ASCII names, whose code point order differs from most locales
+        names = ['Raj', 'raj', 'Rája', 'Ravi', 'ÅRa', 'Zara', 'ära', 'Bára', 'RAJ', 'Ra Ra']
+        for i, name in enumerate(names):
+            user = User.objects.create_user(phone_number=f'+155560001{i:02d}', name=name)
+            if i % 2:
+                # Same (name, phone) pair as the user, which both modes show once
+                Contact.objects.create(owner=cls.alice, name=name, phone_number=user.phone_number, registered_user=user)
+            Contact.objects.create(owner=user, name=name, phone_number=f'+155560002{i:02d}')
+            Contact.objects.create(owner=user, name=f'{name} Jr', phone_number=cls.alice.phone_number, registered_user=cls.alice)
+
+    def test_stream_matches_json(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        for query in ('ra', 'rá', 'jr'):
+            with self.subTest(query=query), mock.patch.object(SearchByNameView, 'stream_chunk_size', 3):
+                expected = client.get('/api/search/name/', {'q': query}).json()
+                response = client.get('/api/search/name/', {'q': query, 'stream': '1'})
+                lines = b''.join(response.streaming_content).decode().splitlines()
+                self.assertEqual([json.loads(line) for line in lines], expected)
+                self.assertTrue(expected)
+
+
+class PhoneSnapshotTests(TestCase):
+    registered = '+15558000001'
+    registered_no_email = '+15558000002'
+    contacts_only = '+15558000009'
+    unknown = '+15558000404'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(phone_number='+15558000000', name='Alice', password='pw-12345!')
+        zoe = User.objects.create_user(phone_number=cls.registered, name='Zoë Ångström', email='zoe@example.com')
+        jose = User.objects.create_user(phone_number=cls.registered_no_email, name='José')
+        # Zoë has Alice in her contacts, so Alice may see her email
+        Contact.objects.create(owner=zoe, name='Alice', phone_number=cls.alice.phone_number, registered_user=cls.alice)
+        Contact.objects.create(owner=cls.alice, name='Zoe work', phone_number=cls.registered, registered_user=zoe)
+        bob = User.objects.create_user(phone_number='+15558000003', name='Bob')
+        for owner, name in ((cls.alice, 'Сантехник'), (zoe, '水道屋'), (jose, 'Plumber'), (bob, 'Plumber')):
+            Contact.objects.create(owner=owner, name=name, phone_number=cls.contacts_only)
+        SpamReport.objects.create(phone_number=cls.contacts_only, reported_by=zoe)
+        compact_spam_counters()
+        SpamReport.objects.create(phone_number=cls.contacts_only, reported_by=jose)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        # Events this recent are kept above the change position; the fixture is older
+        ChangeEvent.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, snapshot_dir, ignore_errors=True)
+        self.path = f'{snapshot_dir}/phones.snapshot'
+        call_command('export_phone_snapshot', output=self.path, stdout=io.StringIO())
+
+    def search(self, params):
+        response = self.client.get('/api/search/phone/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_round_trip(self):
+        lookup = mock.patch.object(PhoneSnapshot, 'lookup', autospec=True, side_effect=PhoneSnapshot.lookup)
+        for phone in (self.registered, self.registered_no_email, self.contacts_only, self.unknown):
+            for params in ({}, {'full': '1'}, {'full': '1', 'limit': '2', 'offset': '1'}):
+                params = dict(params, phone=phone)
+                with self.subTest(**params):
+                    from_db = self.search(params)
+                    with override_settings(PHONE_SNAPSHOT_PATH=self.path), lookup as spy:
+                        self.assertEqual(self.search(params), from_db)
+                        spy.assert_called_once()
+        self.assertEqual(self.search({'phone': self.contacts_only})[0]['total_contacts'], 4)
+
+    def test_changed_numbers_use_the_database(self):
+        carol = User.objects.create_user(phone_number='+15558000004', name='Carol')
+        Contact.objects.create(owner=carol, name='Ĝardenisto', phone_number=self.contacts_only)
+        with override_settings(PHONE_SNAPSHOT_PATH=self.path), \
+                mock.patch.object(PhoneSnapshot, 'lookup', autospec=True) as lookup:
+            results = self.search({'phone': self.contacts_only, 'full': '1'})['results']
+            lookup.assert_not_called()
+        self.assertIn('Ĝardenisto', [r['name'] for r in results])
@@ -0,0 +1,129 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+# GCRA (generic cell rate algorithm): a token bucket that stores a single number per
+# key, the "theoretical arrival time" (TAT) at which the bucket is full again. A key
+# whose TAT has passed is equivalent to a missing key, so entries expire lazily.
+
+
+class LocalGCRAStore:
+    """
+    In-process store. Updates to one key are serialized by one of a fixed set of
+    striped locks, so unrelated keys rarely contend. Expired keys are swept in bulk
+    whenever the table doubles in size, which keeps sweeping O(1) amortized.
+    """
+
+    def __init__(self, stripes=64):
+        self._tats = {}
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._next_sweep = 1024
+
+    def update(self, key, interval, tolerance, now):
+        with self._locks[hash(key) % len(self._locks)]:
+            tat = max(self._tats.get(key, now), now)
+            if tat - now > tolerance:
+                return tat - now - tolerance
+            self._tats[key] = tat + interval
+        if len(self._tats) >= self._next_sweep:
+            self._sweep(now)
+        return 0
+
+    def _sweep(self, now):
+        for key, tat in list(self._tats.items()):
+            if tat <= now:
+                self._tats.pop(key, None)
+        self._next_sweep = max(1024, len(self._tats) * 2)
+
+
+class CacheGCRAStore:
+    """
+    Shared store on a Django cache (API_THROTTLE_CACHE), for limits that apply
+    across worker processes. The cache timeout doubles as the lazy expiry. The
+    read-modify-write is not atomic, so concurrent requests for one key can
+    occasionally both be let through.
+    """
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or getattr(settings, 'API_THROTTLE_CACHE', 'default')]
+
+    def update(self, key, interval, tolerance, now):
+        tat = max(self.cache.get(key, now), now)
+        if tat - now > tolerance:
+            return tat - now - tolerance
+        self.cache.set(key, tat + interval, timeout=int(tat + interval - now) + 1)
+        return 0
+
+
+STORES = {
+    'local': LocalGCRAStore,
+    'cache': CacheGCRAStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = STORES[getattr(settings, 'API_THROTTLE_STORE', 'local')]()
+    return _store
+
+
+class ScopedGCRAThrottle(SimpleRateThrottle):
+    """
+    Per-user limit for views that set `throttle_scope`, using the rate configured
+    for that scope in DEFAULT_THROTTLE_RATES. Anonymous requests fall back to the
+    client IP. Views without a scope are not throttled.
+    """
+    scope_suffix = ''
+    cache_format = 'gcra_%(scope)s_%(ident)s'
+
+    def __init__(self):
+        # The rate depends on the view, so it is resolved in allow_request
+        self._wait = None
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return True
+        self.scope = scope + self.scope_suffix
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        # A full bucket allows num_requests back to back, then one every interval
+        interval = self.duration / self.num_requests
+        self._wait = get_store().update(key, interval, self.duration - interval, self.timer())
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class ScopedIPGCRAThrottle(ScopedGCRAThrottle):
+    """
+    Per-IP limit for the same scopes, using the `<scope>_ip` rate, so one client
+    cannot get around the per-user limit by rotating accounts.
+    """
+    scope_suffix = '_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
@@ -0,0 +1,218 @@
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import SpamReport
+
+logger = logging.getLogger(__name__)
+
+# Sliding windows for the spam leaderboard, in minutes
+WINDOWS = {
+    'hour': 60,
+    'day': 60 * 24,
+    'week': 60 * 24 * 7,
+}
+
+
+class CountIndex:
+    """
+    Counts per key with O(1) increment/decrement and O(K) top-K.
+
+    Keys with the same count share a bucket, and the non-empty buckets form a
+    doubly linked list ordered by count (0 is the head sentinel), so a count
+    change only ever moves a key to the neighbouring bucket.
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._members = {}
+        self._higher = {0: None}
+        self._lower = {}
+        self._top = 0
+
+    def __len__(self):
+        return len(self._counts)
+
+    def get(self, key):
+        return self._counts.get(key, 0)
+
+    def _link(self, count, lower):
+        higher = self._higher[lower]
+        self._higher[lower] = count
+        self._lower[count] = lower
+        self._higher[count] = higher
+        if higher is None:
+            self._top = count
+        else:
+            self._lower[higher] = count
+        self._members[count] = set()
+
+    def _unlink(self, count):
+        lower = self._lower.pop(count)
+        higher = self._higher.pop(count)
+        self._higher[lower] = higher
+        if higher is None:
+            self._top = lower
+        else:
+            self._lower[higher] = lower
+        del self._members[count]
+
+    def _move(self, key, old, new):
+        if new:
+            self._members[new].add(key)
+            self._counts[key] = new
+        else:
+            del self._counts[key]
+        if old:
+            self._members[old].discard(key)
+            if not self._members[old]:
+                self._unlink(old)
+
+    def incr(self, key):
+        old = self._counts.get(key, 0)
+        new = old + 1
+        if new not in self._members:
+            self._link(new, lower=old)
+        self._move(key, old, new)
+
+    def decr(self, key):
+        old = self._counts.get(key, 0)
+        if not old:
+            return
+        new = old - 1
+        if new and new not in self._members:
+            self._link(new, lower=self._lower[old])
+        self._move(key, old, new)
+
+    def top(self, k):
+        results = []
+        count = self._top
+        while count and len(results) < k:
+            # Ties in key order, without sorting a large bucket of 1s
+            for key in heapq.nsmallest(k - len(results), self._members[count]):
+                results.append((key, count))
+            count = self._lower[count]
+        return results
+
+
+class SpamTrends:
+    """
+    Report counts per number over sliding time windows.
+
+    Reports are kept in per-minute buckets in a ring buffer as long as the widest
+    window. Each window has its own CountIndex: a report is added to every window
+    when it is recorded and removed again once its minute slides out of the
+    window, so reading the top K never scans reports.
+
+    State is per process: it is loaded from the database and then follows the
+    reports written through this process. Reports written by other processes and
+    deletes are only picked up when it is reloaded (see get_spam_trends).
+    """
+
+    def __init__(self, windows=WINDOWS, clock=time.time):
+        self.windows = dict(windows)
+        self._clock = clock
+        self.span = max(self.windows.values())
+        self._ring = [None] * self.span
+        self._indexes = {name: CountIndex() for name in self.windows}
+        self._lock = threading.Lock()
+        now = self._minute(self._clock())
+        self._expired_through = {name: now - minutes for name, minutes in self.windows.items()}
+
+    @staticmethod
+    def _minute(timestamp):
+        return int(timestamp // 60)
+
+    def _advance(self, now):
+        for name, minutes in self.windows.items():
+            cutoff = now - minutes
+            expired_through = self._expired_through[name]
+            if cutoff <= expired_through:
+                continue
+            if cutoff - expired_through >= self.span:
+                # Idle for longer than the ring: everything in the window has expired
+                self._indexes[name] = CountIndex()
+            else:
+                index = self._indexes[name]
+                for minute in range(expired_through + 1, cutoff + 1):
+                    bucket = self._ring[minute % self.span]
+                    if bucket is not None and bucket[0] == minute:
+                        for phone_number, count in bucket[1].items():
+                            for _ in range(count):
+                                index.decr(phone_number)
+            self._expired_through[name] = cutoff
+
+    def record(self, phone_number, reported_at=None):
+        now = self._minute(self._clock())
+        minute = now if reported_at is None else self._minute(reported_at.timestamp())
+        with self._lock:
+            self._advance(now)
+            if minute <= now - self.span or minute > now:
+                return
+            slot = minute % self.span
+            bucket = self._ring[slot]
+            if bucket is None or bucket[0] != minute:
+                bucket = self._ring[slot] = (minute, Counter())
+            bucket[1][phone_number] += 1
+            for name, minutes in self.windows.items():
+                if minute > now - minutes:
+                    self._indexes[name].incr(phone_number)
+
+    def top(self, window, k=10):
+        with self._lock:
+            self._advance(self._minute(self._clock()))
+            return self._indexes[window].top(k)
+
+
+def load_spam_trends():
+    trends = SpamTrends()
+    since = timezone.now() - timedelta(minutes=trends.span)
+    reports = SpamReport.objects.filter(reported_at__gte=since).order_by().values_list('phone_number', 'reported_at')
+    for phone_number, reported_at in reports.iterator(chunk_size=2000):
+        trends.record(phone_number, reported_at)
+    return trends
+
+
+def _reload_forever(interval):
+    global _spam_trends
+    while True:
+        time.sleep(interval)
+        try:
+            # Swapped in whole; reports recorded into the old one meanwhile are in
+            # the database and counted again by the next reload at the latest
+            _spam_trends = load_spam_trends()
+        except Exception:
+            logger.exception('Reloading spam trends failed.')
+        finally:
+            close_old_connections()
+
+
+_spam_trends = None
+_spam_trends_lock = threading.Lock()
+
+
+def get_spam_trends():
+    """
+    The process-wide leaderboard. It is loaded on first use, and a daemon thread
+    reloads it every SPAM_TRENDS_RELOAD_INTERVAL seconds so that reports from other
+    processes and deleted reports are reflected.
+    """
+    global _spam_trends
+    if _spam_trends is None:
+        with _spam_trends_lock:
+            if _spam_trends is None:
+                _spam_trends = load_spam_trends()
+                interval = settings.SPAM_TRENDS_RELOAD_INTERVAL
+                if interval:
+                    threading.Thread(
+                        target=_reload_forever, args=(interval,),
+                        name='spam-trends-reloader', daemon=True,
+                    ).start()
+    return _spam_trends
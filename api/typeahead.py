@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .utils import is_local_cache
+
+# Bumped after every committed User or Contact write (see api.signals). Cached results
+# remember the generation they were computed in and are ignored once it moves on.
+GENERATION_KEY = 'api:typeahead:generation'
+
+
+def _generation_cache():
+    return caches[settings.TYPEAHEAD_GENERATION_CACHE]
+
+
+def typeahead_enabled():
+    # Off unless the generation counter is shared by all processes: with a per-process
+    # cache, a write in one worker would not invalidate the results cached by the others
+    return bool(settings.TYPEAHEAD_CACHE_TTL) and not is_local_cache(settings.TYPEAHEAD_GENERATION_CACHE)
+
+
+def current_generation():
+    return _generation_cache().get(GENERATION_KEY, 0)
+
+
+def bump_generation():
+    cache = _generation_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Not set yet (or evicted); add() loses to a concurrent add, so incr again
+        if not cache.add(GENERATION_KEY, 1, timeout=None):
+            cache.incr(GENERATION_KEY)
+
+
+def filter_results(results, query):
+    # Name search results for query, taken from the results of a shorter query it
+    # extends. Every name containing query also contains the shorter one, so nothing
+    # is missed; match types and order are recomputed for the new query.
+    needle = query.lower()
+    narrowed = []
+    for r in results:
+        name = r['name'].lower()
+        if needle in name:
+            narrowed.append(dict(r, _match_type=1 if name.startswith(needle) else 2))
+    narrowed.sort(key=lambda x: (x['_match_type'], x['name']))
+    return narrowed
+
+
+class TypeaheadCache:
+    # Recent name search results per user, for search-as-you-type clients sending
+    # "ra", "raj", "raje", ... Only complete result lists are stored, so a query that
+    # extends a stored one is answered by filtering it in memory. Both the users and
+    # each user's queries are LRU-bounded, and entries expire after ttl seconds.
+    def __init__(self, max_users=1000, queries_per_user=8, max_results=500, ttl=30):
+        self.max_users = max_users
+        self.queries_per_user = queries_per_user
+        self.max_results = max_results
+        self.ttl = ttl
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, query, generation):
+        query = query.lower()
+        now = time.monotonic()
+        with self._lock:
+            queries = self._users.get(user_id)
+            best = None
+            if queries is not None:
+                self._users.move_to_end(user_id)
+                for cached_query, (stored_at, stored_generation, results) in list(queries.items()):
+                    if stored_generation != generation or now - stored_at > self.ttl:
+                        del queries[cached_query]
+                    elif query.startswith(cached_query) and (best is None or len(cached_query) > len(best)):
+                        best = cached_query
+            if best is None:
+                self.misses += 1
+                return None
+            queries.move_to_end(best)
+            self.hits += 1
+            results = queries[best][2]
+        return results if best == query else filter_results(results, query)
+
+    def put(self, user_id, query, generation, results):
+        if len(results) > self.max_results:
+            return
+        with self._lock:
+            queries = self._users.get(user_id)
+            if queries is None:
+                queries = self._users[user_id] = OrderedDict()
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            self._users.move_to_end(user_id)
+            queries[query.lower()] = (time.monotonic(), generation, results)
+            queries.move_to_end(query.lower())
+            while len(queries) > self.queries_per_user:
+                queries.popitem(last=False)
+
+
+_typeahead_cache = None
+_typeahead_cache_lock = threading.Lock()
+
+
+def get_typeahead_cache():
+    global _typeahead_cache
+    if _typeahead_cache is None:
+        with _typeahead_cache_lock:
+            if _typeahead_cache is None:
+                _typeahead_cache = TypeaheadCache(
+                    max_users=settings.TYPEAHEAD_CACHE_USERS,
+                    queries_per_user=settings.TYPEAHEAD_CACHE_QUERIES_PER_USER,
+                    max_results=settings.TYPEAHEAD_CACHE_MAX_RESULTS,
+                    ttl=settings.TYPEAHEAD_CACHE_TTL,
+                )
+    return _typeahead_cache
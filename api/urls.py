@@ -1,8 +1,18 @@
 from django.urls import path
-from .views import MarkAsSpamView, SearchByNameView, SearchByPhoneView
+from .views import (
+    MarkAsSpamView,
+    TopSpamNumbersView,
+    SearchByNameView,
+    SearchByPhoneView,
+    SearchByPhonePrefixView,
+    HotNumbersMetricsView,
+)
 
 urlpatterns = [
     path('spam/mark/', MarkAsSpamView.as_view(), name='mark-spam'),
+    path('spam/top/', TopSpamNumbersView.as_view(), name='spam-top'),
     path('search/name/', SearchByNameView.as_view(), name='search-by-name'),
     path('search/phone/', SearchByPhoneView.as_view(), name='search-by-phone'),
+    path('search/phone/prefix/', SearchByPhonePrefixView.as_view(), name='search-by-phone-prefix'),
+    path('metrics/hot-numbers/', HotNumbersMetricsView.as_view(), name='metrics-hot-numbers'),
 ]
\ No newline at end of file
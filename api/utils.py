@@ -1,15 +1,42 @@
-from django.db.models import Count
-from .models import SpamReport
+from collections import Counter
+from django.conf import settings
+from .models import SpamCounterStripe, SpamScore
+
+# Cache backends whose entries are private to each process
+LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+def is_local_cache(alias):
+    return settings.CACHES.get(alias, {}).get('BACKEND') in LOCAL_CACHE_BACKENDS
+
+def get_report_counts(phone_numbers):
+    # Live report count per number: the compacted count plus the not yet compacted
+    # stripes, read in one UNION ALL query
+    phone_numbers = {p for p in phone_numbers if p}
+    compacted = SpamScore.objects.filter(phone_number__in=phone_numbers).values_list('phone_number', 'report_count')
+    stripes = SpamCounterStripe.objects.filter(phone_number__in=phone_numbers).values_list('phone_number', 'count')
+    counts = Counter({p: 0 for p in phone_numbers})
+    for phone_number, count in compacted.order_by().union(stripes.order_by(), all=True):
+        counts[phone_number] += count
+    return counts
 
 def get_spam_likelihood(phone_number):
     if not phone_number:
         return 0
     
-    report_count = SpamReport.objects.filter(phone_number=phone_number).count()
+    return spam_likelihood_from_count(get_report_counts([phone_number])[phone_number])
 
-    MAX_REPORTS_FOR_HIGH_SPAM = 10 # If 10 or more reports, consider it high likelihood
+def get_spam_likelihoods(phone_numbers):
+    # Same as get_spam_likelihood, for many numbers in a single query
+    return {p: spam_likelihood_from_count(count) for p, count in get_report_counts(phone_numbers).items()}
+
+def spam_likelihood_from_count(report_count, max_reports=None):
+    # If SPAM_MAX_REPORTS_FOR_HIGH_SPAM or more reports, consider it high likelihood
+    MAX_REPORTS_FOR_HIGH_SPAM = max_reports or settings.SPAM_MAX_REPORTS_FOR_HIGH_SPAM
     
-    if report_count == 0:
+    if report_count <= 0:
         return 0.0
     elif report_count >= MAX_REPORTS_FOR_HIGH_SPAM:
         return 100.0
@@ -26,4 +53,9 @@ def normalize_phone_number_for_search(phone_number_str):
     elif not normalized.isdigit():
         return phone_number_str
     
-    return normalized
\ No newline at end of file
+    return normalized
+
+def phone_prefix_bounds(prefix):
+    # Half-open range [prefix, upper) covering every number that starts with prefix,
+    # so the lookup is an index range scan instead of a LIKE over the whole table.
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
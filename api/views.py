@@ -1,20 +1,72 @@
+import heapq
+from collections import Counter
+from itertools import groupby, islice
+from operator import itemgetter
+
 from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+from django.db import connection
 from django.db.models import Q, Case, When, Value, IntegerField, BooleanField, F
+from django.db.models.functions import Collate
+from django.conf import settings
+from django.http import StreamingHttpResponse
 
 
 from .models import SpamReport, Contact
 from auth_user.models import User
-from .serializers import SpamReportSerializer, SearchResultSerializer
+from .serializers import SpamReportSerializer, SearchResultSerializer, PhoneNameSummarySerializer
+from .hotnumbers import get_hot_numbers
+from .names import get_name_summary
+from .renderers import NDJSONRenderer
+from .trending import WINDOWS, get_spam_trends
+from .snapshot import get_phone_snapshot, number_changed_since
+from .typeahead import current_generation, get_typeahead_cache, typeahead_enabled
+from .utils import (
+    get_spam_likelihood,
+    get_spam_likelihoods,
+    normalize_phone_number_for_search,
+    phone_prefix_bounds,
+    spam_likelihood_from_count,
+)
+
+# Collations that order text by code point, as Python compares str, per database vendor
+CODE_POINT_COLLATIONS = {'postgresql': 'C', 'sqlite': 'BINARY'}
+
+class LimitOffsetMixin:
+    # limit/offset paging for list views that fetch one row past the page, which
+    # tells whether there is a next page without counting
+    default_limit = 50
+    max_limit = 200
+
+    def get_limit_offset(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+            offset = int(self.request.query_params.get('offset', 0))
+        except ValueError:
+            return self.default_limit, 0
+        return min(max(limit, 1), self.max_limit), max(offset, 0)
+
+    def paginate_rows(self, rows):
+        # The page and the URL of the next one (None on the last page)
+        limit, offset = self.get_limit_offset()
+        if len(rows) <= limit:
+            return rows, None
+        return rows[:limit], replace_query_param(self.request.build_absolute_uri(), 'offset', offset + limit)
 
 class MarkAsSpamView(generics.CreateAPIView):
     serializer_class = SpamReportSerializer
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'spam'
 
     def perform_create(self, serializer):
-        serializer.save(reported_by=self.request.user) 
-        pass
+        # Load the leaderboard before saving so the warm-up cannot count this report twice
+        spam_trends = get_spam_trends()
+        report = serializer.save(reported_by=self.request.user)
+        spam_trends.record(report.phone_number, report.reported_at)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -26,17 +78,43 @@ class MarkAsSpamView(generics.CreateAPIView):
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+class TopSpamNumbersView(APIView):
+    permission_classes = [IsAuthenticated]
+    default_limit = 10
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        window = request.query_params.get('window', 'day')
+        if window not in WINDOWS:
+            return Response(
+                {"window": f"Must be one of: {', '.join(WINDOWS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        top_numbers = get_spam_trends().top(window, limit)
+        return Response({
+            'window': window,
+            'results': [
+                {'phone_number': phone_number, 'report_count': report_count}
+                for phone_number, report_count in top_numbers
+            ]
+        })
+
 class SearchByNameView(generics.ListAPIView):
     serializer_class = SearchResultSerializer
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'search'
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
 
-    def get_queryset(self):
-        query = self.request.query_params.get('q', None)
-        if not query or len(query) < 2:
-            return [] 
-        
-        # 1. Search in registered Users
-        users_qs = User.objects.filter(
+    # Rows fetched per database round trip when streaming
+    stream_chunk_size = 500
+
+    def _users_queryset(self, query):
+        return User.objects.filter(
             Q(name__istartswith=query) | Q(name__icontains=query)
         ).annotate(
             match_type=Case(
@@ -48,8 +126,8 @@ class SearchByNameView(generics.ListAPIView):
             contact_name=F('name') # User's own name is the contact_name
         ).values('id', 'contact_name', 'phone_number', 'email', 'match_type', 'is_actually_registered')
 
-        # 2. Search in Contacts (non-registered or where name is different)
-        contacts_qs = Contact.objects.filter(
+    def _contacts_queryset(self, query):
+        return Contact.objects.filter(
             Q(name__istartswith=query) | Q(name__icontains=query)
         ).annotate(
             match_type=Case(
@@ -66,20 +144,52 @@ class SearchByNameView(generics.ListAPIView):
         ).select_related('registered_user').values( # Select related for registered_user's email if needed
             'id', 'contact_name', 'phone_number', 'match_type', 'is_actually_registered', 'registered_user__email', 'registered_user_id'
         )
+
+    def _user_result(self, user_data):
+        return {
+            'name': user_data['contact_name'],
+            'phone_number': user_data['phone_number'],
+            'email_candidate': user_data['email'],
+            'is_registered_user_instance_pk': user_data['id'],
+            'is_registered_user': True,
+            '_match_type': user_data['match_type']
+        }
+
+    def _contact_result(self, contact_data):
+        return {
+            'name': contact_data['contact_name'],
+            'phone_number': contact_data['phone_number'],
+            'email_candidate': contact_data['registered_user__email'] if contact_data['is_actually_registered'] else None,
+            'is_registered_user_instance_pk': contact_data['registered_user_id'] if contact_data['is_actually_registered'] else None,
+            'is_registered_user': contact_data['is_actually_registered'],
+            '_match_type': contact_data['match_type']
+        }
+
+    def get_queryset(self):
+        query = self.request.query_params.get('q', None)
+        if not query or len(query) < 2:
+            return [] 
+
+        typeahead_cache = get_typeahead_cache() if typeahead_enabled() else None
+        if typeahead_cache is not None:
+            # Read before searching, so a write committed meanwhile invalidates what we store
+            generation = current_generation()
+            cached_results = typeahead_cache.get(self.request.user.pk, query, generation)
+            if cached_results is not None:
+                return cached_results
+        
+        # 1. Search in registered Users
+        users_qs = self._users_queryset(query)
+
+        # 2. Search in Contacts (non-registered or where name is different)
+        contacts_qs = self._contacts_queryset(query)
         
         results = []
         seen_phone_numbers_for_registered_users = set()
 
         # Process registered users first
         for user_data in users_qs.order_by('match_type', 'contact_name'):
-            results.append({
-                'name': user_data['contact_name'],
-                'phone_number': user_data['phone_number'],
-                'email_candidate': user_data['email'],
-                'is_registered_user_instance_pk': user_data['id'],
-                'is_registered_user': True,
-                '_match_type': user_data['match_type']
-            })
+            results.append(self._user_result(user_data))
             seen_phone_numbers_for_registered_users.add(user_data['phone_number'])
 
         # Process contacts, avoiding duplicates if a registered user with the same phone was already added
@@ -89,14 +199,7 @@ class SearchByNameView(generics.ListAPIView):
                                                 User.objects.filter(pk=contact_data['registered_user_id'], name=contact_data['contact_name']).exists()
 
             if not is_primary_registered_user_record:
-                results.append({
-                    'name': contact_data['contact_name'],
-                    'phone_number': contact_data['phone_number'],
-                    'email_candidate': contact_data['registered_user__email'] if contact_data['is_actually_registered'] else None,
-                    'is_registered_user_instance_pk': contact_data['registered_user_id'] if contact_data['is_actually_registered'] else None,
-                    'is_registered_user': contact_data['is_actually_registered'],
-                    '_match_type': contact_data['match_type']
-                })
+                results.append(self._contact_result(contact_data))
         
         final_results_map = {}
         for r in results:
@@ -119,16 +222,90 @@ class SearchByNameView(generics.ListAPIView):
             else:
                 r_dict['is_registered_user_instance'] = None
 
+        if typeahead_cache is not None:
+            typeahead_cache.put(self.request.user.pk, query, generation, sorted_results)
         return sorted_results # List of dictionaries
 
+    def _stream_results(self, query):
+        # Same ordering and de-duplication as get_queryset, but rows are pulled from
+        # the database lazily. Both querysets are ordered by name within a match type,
+        # so a merge keeps the overall order and duplicates of a (name, phone) pair are
+        # always adjacent, which means only the current name group is held in memory.
+        # The merge compares names as Python str, so the database has to order them by
+        # code point too, not by a locale collation.
+        collation = CODE_POINT_COLLATIONS.get(connection.vendor)
+        name_order = Collate(F('contact_name'), collation) if collation else F('contact_name')
+        for match_type in (1, 2):
+            users = (
+                self._user_result(row) for row in
+                self._users_queryset(query).filter(match_type=match_type)
+                .order_by(name_order).iterator(chunk_size=self.stream_chunk_size)
+            )
+            contacts = (
+                self._contact_result(row) for row in
+                self._contacts_queryset(query).filter(match_type=match_type)
+                .order_by(name_order).iterator(chunk_size=self.stream_chunk_size)
+            )
+            merged = heapq.merge(users, contacts, key=itemgetter('name'))
+            for _, group in groupby(merged, key=itemgetter('name')):
+                by_phone = {}
+                for r in group:
+                    existing = by_phone.get(r['phone_number'])
+                    # Prioritize entries that are confirmed registered users
+                    if existing is None or (r['is_registered_user'] and not existing['is_registered_user']):
+                        by_phone[r['phone_number']] = r
+                yield from by_phone.values()
+
+    def _stream_chunks(self, request, query):
+        renderer = NDJSONRenderer()
+        results = self._stream_results(query)
+        while True:
+            chunk = list(islice(results, self.stream_chunk_size))
+            if not chunk:
+                return
+            user_pks_to_fetch = {r['is_registered_user_instance_pk'] for r in chunk if r.get('is_registered_user_instance_pk')}
+            user_instances_map = User.objects.in_bulk(user_pks_to_fetch)
+            for r_dict in chunk:
+                r_dict['is_registered_user_instance'] = user_instances_map.get(r_dict['is_registered_user_instance_pk'])
+            spam_likelihoods = get_spam_likelihoods(r['phone_number'] for r in chunk)
+            serializer = self.get_serializer(
+                chunk, many=True, context={'request': request, 'spam_likelihoods': spam_likelihoods}
+            )
+            yield ''.join(renderer.render_line(item) for item in serializer.data)
+
+    def wants_stream(self, request):
+        return (
+            request.query_params.get('stream') in ('1', 'true')
+            or getattr(request.accepted_renderer, 'format', None) == NDJSONRenderer.format
+        )
+
     def list(self, request, *args, **kwargs):
+        if self.wants_stream(request):
+            query = request.query_params.get('q', None)
+            if not query or len(query) < 2:
+                chunks = iter(())
+            else:
+                chunks = self._stream_chunks(request, query)
+            return StreamingHttpResponse(chunks, content_type=NDJSONRenderer.media_type)
+
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True, context={'request': request})
+        spam_likelihoods = get_spam_likelihoods(r['phone_number'] for r in queryset)
+        serializer = self.get_serializer(
+            queryset, many=True, context={'request': request, 'spam_likelihoods': spam_likelihoods}
+        )
         return Response(serializer.data)
 
-class SearchByPhoneView(generics.ListAPIView):
+class SearchByPhoneView(LimitOffsetMixin, generics.ListAPIView):
+    # For a number without a registered user, contacts can hold it thousands of times,
+    # so by default only a summary of the most common names is returned. Pass full=1
+    # for the individual contact entries, paged with limit/offset.
     serializer_class = SearchResultSerializer
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'search'
+    summary_size = 5
+
+    def wants_full_results(self):
+        return self.request.query_params.get('full') in ('1', 'true')
 
     def get_queryset(self):
         phone_query = self.request.query_params.get('phone', None)
@@ -136,24 +313,46 @@ class SearchByPhoneView(generics.ListAPIView):
             return []
         
         normalized_phone_query = phone_query
+        full_results = self.wants_full_results()
+        limit, offset = self.get_limit_offset()
 
-        results_data = []
+        if not full_results:
+            hot_numbers = get_hot_numbers(loader=self.hot_number_payload)
+            hot_numbers.record(normalized_phone_query)
+            pinned = hot_numbers.get_pinned(normalized_phone_query)
+            if pinned is not None:
+                results, self.summary, spam_likelihood = pinned
+                self.spam_likelihoods = {normalized_phone_query: spam_likelihood}
+                return results
+
+        snapshot_results = self._snapshot_results(normalized_phone_query)
+        if snapshot_results is not None:
+            if not snapshot_results or snapshot_results[0]['is_registered_user']:
+                return snapshot_results
+            if full_results:
+                return snapshot_results[offset:offset + limit + 1]
+            names = Counter(r['name'] for r in snapshot_results)
+            top_names = [
+                {'name': name, 'count': count}
+                for name, count in sorted(names.items(), key=lambda item: (-item[1], item[0]))[:self.summary_size]
+            ]
+            self.summary = True
+            return [self._summary(normalized_phone_query, top_names, len(snapshot_results))]
+
+        if not full_results:
+            results, self.summary = self.lookup_number(normalized_phone_query)
+            return results
 
         # 1. Check for a registered user with this phone number
-        try:
-            registered_user = User.objects.get(phone_number=normalized_phone_query)
-            results_data.append({
-                'name': registered_user.name,
-                'phone_number': registered_user.phone_number,
-                'is_registered_user': True,
-                'is_registered_user_instance': registered_user,
-            })
-            return results_data # Return immediately with only this user
-        except User.DoesNotExist:
-            pass
+        registered_user_result = self._registered_user_result(normalized_phone_query)
+        if registered_user_result is not None:
+            return [registered_user_result] # Return immediately with only this user
 
-        # 2. If no registered user, search in Contacts for exact matches
-        contacts_qs = Contact.objects.filter(phone_number=normalized_phone_query)
+        # 2. If no registered user, list the contact entries themselves, one page at a time
+        results_data = []
+        contacts_qs = Contact.objects.filter(
+            phone_number=normalized_phone_query
+        ).select_related('registered_user').order_by('name', 'id')[offset:offset + limit + 1]
         
         for contact in contacts_qs:
             user_instance_for_contact = None
@@ -168,8 +367,165 @@ class SearchByPhoneView(generics.ListAPIView):
             })
         
         return results_data
+
+    @classmethod
+    def lookup_number(cls, phone_number):
+        # Default (non-full) answer from the database: (results, is_summary)
+        registered_user_result = cls._registered_user_result(phone_number)
+        if registered_user_result is not None:
+            return [registered_user_result], False
+
+        # If no registered user, summarize the names saved for this number
+        top_names, total_contacts = get_name_summary(phone_number, cls.summary_size)
+        if not top_names:
+            return [], False
+        return [cls._summary(phone_number, top_names, total_contacts)], True
+
+    @classmethod
+    def hot_number_payload(cls, phone_number):
+        # What the hot number warmer pins for a popular number
+        results, is_summary = cls.lookup_number(phone_number)
+        return results, is_summary, get_spam_likelihood(phone_number)
+
+    @staticmethod
+    def _registered_user_result(phone_number):
+        try:
+            registered_user = User.objects.get(phone_number=phone_number)
+        except User.DoesNotExist:
+            return None
+        return {
+            'name': registered_user.name,
+            'phone_number': registered_user.phone_number,
+            'is_registered_user': True,
+            'is_registered_user_instance': registered_user,
+        }
+
+    @staticmethod
+    def _summary(phone_number, top_names, total_contacts):
+        return {
+            'name': top_names[0]['name'],
+            'phone_number': phone_number,
+            'is_registered_user': False,
+            'is_registered_user_instance': None,
+            'names': top_names,
+            'total_contacts': total_contacts,
+        }
+
+    def _snapshot_results(self, phone_number):
+        # Answer from the memory-mapped snapshot when one is configured and the
+        # number has not changed since it was exported; None means use the database.
+        snapshot = get_phone_snapshot()
+        if snapshot is None or number_changed_since(phone_number, snapshot.change_position):
+            return None
+        found = snapshot.lookup(phone_number)
+        if found is None:
+            return None
+
+        spam_count, entries = found
+        self.spam_likelihoods = {phone_number: spam_likelihood_from_count(spam_count)}
+        return [
+            {
+                'name': name,
+                'phone_number': phone_number,
+                'is_registered_user': user_id is not None,
+                # Built from the snapshot, only the pk and email are used when serializing
+                'is_registered_user_instance': User(pk=user_id, email=email) if user_id else None,
+            }
+            for user_id, name, email in entries
+        ]
     
     def list(self, request, *args, **kwargs):
+        self.spam_likelihoods = None
+        self.summary = False
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True, context={'request': request})
-        return Response(serializer.data)
\ No newline at end of file
+        if self.spam_likelihoods is None:
+            # Every row is for the same number, so score it once
+            self.spam_likelihoods = get_spam_likelihoods(r['phone_number'] for r in queryset)
+        context = {'request': request, 'spam_likelihoods': self.spam_likelihoods}
+        if self.summary:
+            return Response(PhoneNameSummarySerializer(queryset, many=True, context=context).data)
+        if not self.wants_full_results():
+            serializer = self.get_serializer(queryset, many=True, context=context)
+            return Response(serializer.data)
+
+        queryset, next_url = self.paginate_rows(queryset)
+        serializer = self.get_serializer(queryset, many=True, context=context)
+        return Response({'next': next_url, 'results': serializer.data})
+
+class SearchByPhonePrefixView(LimitOffsetMixin, generics.ListAPIView):
+    # Caller-ID style partial matches, e.g. every number starting with +9198
+    serializer_class = SearchResultSerializer
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'search'
+    min_prefix_digits = 3
+    default_limit = 20
+    max_limit = 100
+
+    def get_prefix(self):
+        prefix = normalize_phone_number_for_search(self.request.query_params.get('prefix', ''))
+        if len(prefix.lstrip('+')) < self.min_prefix_digits or not prefix.lstrip('+').isdigit():
+            return None
+        return prefix
+
+    def _merged_results(self, prefix):
+        lower, upper = phone_prefix_bounds(prefix)
+        users_qs = User.objects.filter(phone_number__gte=lower, phone_number__lt=upper)
+
+        # Same rule as the exact lookup: a registered number is answered by the user
+        # alone, so contacts are only read for numbers without a registered user.
+        contacts_qs = Contact.objects.filter(
+            phone_number__gte=lower, phone_number__lt=upper
+        ).exclude(
+            phone_number__in=users_qs.values('phone_number')
+        ).select_related('registered_user')
+
+        users = (
+            {
+                'name': user.name,
+                'phone_number': user.phone_number,
+                'is_registered_user': True,
+                'is_registered_user_instance': user,
+            }
+            for user in users_qs.order_by('phone_number').iterator(chunk_size=self.max_limit)
+        )
+        contacts = (
+            {
+                'name': contact.name,
+                'phone_number': contact.phone_number,
+                'is_registered_user': bool(contact.registered_user),
+                'is_registered_user_instance': contact.registered_user,
+            }
+            for contact in contacts_qs.order_by('phone_number', 'name').iterator(chunk_size=self.max_limit)
+        )
+        return heapq.merge(users, contacts, key=itemgetter('phone_number', 'name'))
+
+    def get_queryset(self):
+        prefix = self.get_prefix()
+        if prefix is None:
+            return []
+        limit, offset = self.get_limit_offset()
+        # One extra row tells us whether there is a next page without counting
+        return list(islice(self._merged_results(prefix), offset, offset + limit + 1))
+
+    def list(self, request, *args, **kwargs):
+        results, next_url = self.paginate_rows(self.get_queryset())
+
+        spam_likelihoods = get_spam_likelihoods(r['phone_number'] for r in results)
+        serializer = self.get_serializer(
+            results, many=True, context={'request': request, 'spam_likelihoods': spam_likelihoods}
+        )
+        return Response({'next': next_url, 'results': serializer.data})
+
+class HotNumbersMetricsView(APIView):
+    # Hit ratio and memory use of the hot phone number cache in this worker process
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        hot_numbers = get_hot_numbers(loader=SearchByPhoneView.hot_number_payload)
+        data = hot_numbers.stats()
+        data['warm_interval'] = settings.HOT_NUMBERS_WARM_INTERVAL
+        data['top'] = [
+            {'phone_number': phone_number, 'estimated_lookups': estimate}
+            for phone_number, estimate in hot_numbers.top()[:20]
+        ]
+        return Response(data)
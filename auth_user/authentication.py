@@ -0,0 +1,51 @@
+from django.db.models import Exists
+from django.utils.functional import SimpleLazyObject
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import RevokedToken, User
+from .tokens import verify_signed_token
+
+
+def _load_user(claims):
+    # One query for the user and the revocation check. Revocations are kept in the
+    # database, so a logout handled by one worker is seen by all of them.
+    user = User.objects.filter(pk=claims['uid'], is_active=True).annotate(
+        token_revoked=Exists(RevokedToken.objects.filter(jti=claims['jti']))
+    ).first()
+    if user is None:
+        # As TokenAuthentication does: a 401, not a 403 from the permission check
+        raise AuthenticationFailed('User inactive or deleted.')
+    if user.token_revoked:
+        raise AuthenticationFailed('Token has been revoked.')
+    return user
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Stateless signed tokens issued by the login view when AUTH_SIGNED_TOKENS is on.
+
+        Authorization: Bearer <signed token>
+
+    The signature is verified without touching the database; the user row (and
+    whether the token was revoked) is only loaded when the view first reads
+    request.user.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed('Invalid token header.')
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed('Invalid token header.')
+
+        claims = verify_signed_token(token)
+        return SimpleLazyObject(lambda: _load_user(claims)), claims
+
+    def authenticate_header(self, request):
+        return self.keyword
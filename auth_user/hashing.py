@@ -0,0 +1,126 @@
+import logging
+import threading
+from concurrent.futures import BrokenExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# PBKDF2 is pure CPU work that holds the GIL, so a login storm on a threaded worker
+# runs one hash at a time. When PASSWORD_HASHING_POOL_SIZE is set, hashing and
+# verification run in a bounded pool of worker processes instead.
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+class HashingPoolBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Server is busy, please try again shortly.'
+    default_code = 'hashing_pool_busy'
+
+
+def _init_worker():
+    django.setup()
+
+
+def _get_pool():
+    global _executor, _slots
+    size = getattr(settings, 'PASSWORD_HASHING_POOL_SIZE', 0)
+    if not size:
+        return None
+    with _lock:
+        if _executor is None:
+            # Imported here: multiprocessing is slow to import and unused when the pool is off
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            max_pending = getattr(settings, 'PASSWORD_HASHING_POOL_MAX_PENDING', None) or size * 4
+            # spawn, not fork: the web worker is multi-threaded
+            _executor = ProcessPoolExecutor(
+                max_workers=size,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            _slots = threading.BoundedSemaphore(max_pending)
+        return _executor, _slots
+
+
+def shutdown():
+    global _executor, _slots
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = None
+        _slots = None
+
+
+def _reset_pool(executor):
+    # A worker died (e.g. killed by the OOM killer) and the executor refuses all new
+    # work. Drop it so the next call starts a fresh one, unless another thread did.
+    global _executor, _slots
+    with _lock:
+        if _executor is executor:
+            _executor = None
+            _slots = None
+    executor.shutdown(wait=False)
+
+
+def _submit(func, *args):
+    pool = _get_pool()
+    if pool is None:
+        return func(*args)
+    executor, slots = pool
+    # Backpressure: once max_pending hashes are queued, wait briefly for a slot and
+    # then fail fast with a 503 instead of letting the queue (and latency) grow.
+    if not slots.acquire(timeout=getattr(settings, 'PASSWORD_HASHING_POOL_WAIT', 2.0)):
+        raise HashingPoolBusy()
+    try:
+        return executor.submit(func, *args).result()
+    except BrokenExecutor:
+        _reset_pool(executor)
+        raise
+    finally:
+        slots.release()
+
+
+def _run(func, *args):
+    try:
+        return _submit(func, *args)
+    except BrokenExecutor:
+        logger.warning('Password hashing pool broke, starting a new one.')
+    try:
+        return _submit(func, *args)
+    except BrokenExecutor:
+        # The new pool broke as well: hash on the request thread rather than fail
+        logger.exception('Password hashing pool broke again, hashing in process.')
+        return func(*args)
+
+
+def make_password(raw_password):
+    if raw_password is None:
+        # Unusable password, nothing to hash
+        return hashers.make_password(None)
+    return _run(hashers.make_password, raw_password)
+
+
+def check_password(raw_password, encoded):
+    if raw_password is None or not hashers.is_password_usable(encoded):
+        return hashers.check_password(raw_password, encoded)
+    return _run(hashers.check_password, raw_password, encoded)
+
+
+def must_update(encoded):
+    # The upgrade check from django.contrib.auth.hashers.check_password, which
+    # cannot call back into the model from a worker process.
+    preferred = hashers.get_hasher('default')
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
@@ -0,0 +1,46 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from auth_user.models import User
+
+PHONE_NUMBER = '+19999999999'
+PASSWORD = 'bench-password-123'
+
+class Command(BaseCommand):
+    help = 'Measures end-to-end login latency and database round trips per login. Changes are rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=10, help='Logins per token mode.')
+
+    def handle(self, *args, **options):
+        client = Client(SERVER_NAME='localhost')
+        with transaction.atomic():
+            User.objects.filter(phone_number=PHONE_NUMBER).delete()
+            User.objects.create_user(phone_number=PHONE_NUMBER, name='Bench', password=PASSWORD)
+
+            for label, signed in (('database token', False), ('signed token', True)):
+                with override_settings(AUTH_SIGNED_TOKENS=signed):
+                    latencies, queries = self._run(client, options['logins'])
+                self.stdout.write(
+                    f"{label:>15}: median {statistics.median(latencies) * 1000:.1f} ms, "
+                    f"max {max(latencies) * 1000:.1f} ms, "
+                    f"{statistics.mean(queries):.1f} queries/login (first login {queries[0]})"
+                )
+            transaction.set_rollback(True)
+
+    def _run(self, client, logins):
+        latencies, queries = [], []
+        for _ in range(logins):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = client.post('/auth/login/', {'username': PHONE_NUMBER, 'password': PASSWORD})
+                latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                self.stderr.write(self.style.ERROR(f'Login failed with status {response.status_code}.'))
+            queries.append(len(captured.captured_queries))
+        return latencies, queries
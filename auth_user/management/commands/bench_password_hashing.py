@@ -0,0 +1,49 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from auth_user import hashing
+from auth_user.models import User
+
+PASSWORD = 'bench-password-123'
+
+class Command(BaseCommand):
+    help = 'Benchmarks password verification throughput during a login storm, with and without the hashing pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32, help='Concurrent request threads.')
+        parser.add_argument('--logins', type=int, default=256, help='Total password checks per run.')
+        parser.add_argument('--pool-size', type=int, default=os.cpu_count(), help='Worker processes for the pooled run.')
+
+    def handle(self, *args, **options):
+        # Unsaved user: the benchmark only measures the hashing cost, not the database
+        user = User(phone_number='+10000000000', name='Bench')
+        with override_settings(PASSWORD_HASHING_POOL_SIZE=0):
+            user.set_password(PASSWORD)
+
+        self.stdout.write(
+            f"{options['logins']} logins over {options['threads']} threads, {os.cpu_count()} CPUs"
+        )
+        for label, pool_size in (('request thread', 0), (f"pool of {options['pool_size']}", options['pool_size'])):
+            with override_settings(PASSWORD_HASHING_POOL_SIZE=pool_size, PASSWORD_HASHING_POOL_WAIT=60):
+                if pool_size:
+                    # Warm up the worker processes so start-up is not measured
+                    with ThreadPoolExecutor(max_workers=pool_size) as warmup:
+                        list(warmup.map(lambda _: user.check_password(PASSWORD), range(pool_size)))
+                elapsed = self._storm(user, options['threads'], options['logins'])
+                hashing.shutdown()
+            self.stdout.write(
+                f"{label:>16}: {elapsed:.2f}s, {options['logins'] / elapsed:.1f} logins/s"
+            )
+
+    def _storm(self, user, threads, logins):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(lambda _: user.check_password(PASSWORD), range(logins)))
+        elapsed = time.perf_counter() - start
+        if not all(results):
+            self.stderr.write(self.style.ERROR('Some password checks failed.'))
+        return elapsed
@@ -2,6 +2,9 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, Permis
 from django.db import models
 from django.utils import timezone
 
+from api.mixins import AtomicSaveMixin
+from . import hashing
+
 class UserManager(BaseUserManager):
     def create_user(self, phone_number, password=None, **extra_fields):
         if not phone_number:
@@ -25,7 +28,7 @@ class UserManager(BaseUserManager):
 
         return self.create_user(phone_number, password, **extra_fields)
 
-class User(AbstractBaseUser, PermissionsMixin):
+class User(AtomicSaveMixin, AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     phone_number = models.CharField(max_length=20, unique=True)
     email = models.EmailField(max_length=255, unique=True, null=True, blank=True)
@@ -33,6 +36,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False) 
     is_active = models.BooleanField(default=True)
     date_joined = models.DateTimeField(default=timezone.now)
+    # Bumped on every profile update; the profile ETag is built from it
+    profile_version = models.PositiveIntegerField(default=1)
 
     objects = UserManager()
 
@@ -42,6 +47,20 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.phone_number
 
+    def set_password(self, raw_password):
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        # Same as AbstractBaseUser.check_password, but the hash may run in the hashing pool
+        if not hashing.check_password(raw_password, self.password):
+            return False
+        if hashing.must_update(self.password):
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+        return True
+
     groups = models.ManyToManyField(
         'auth.Group',
         verbose_name='groups',
@@ -57,4 +76,14 @@ class User(AbstractBaseUser, PermissionsMixin):
         help_text='Specific permissions for this user.',
         related_name="custom_user_set",
         related_query_name="user",
-    )
\ No newline at end of file
+    )
+
+
+class RevokedToken(models.Model):
+    # Signed tokens revoked by logout, shared by every process. Rows are only needed
+    # until the token would have expired anyway and are pruned after that.
+    jti = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
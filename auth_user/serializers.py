@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F
 from .models import User
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -52,11 +53,27 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = User
         fields = ('id', 'phone_number', 'name', 'email', 'date_joined')
         read_only_fields = ('id', 'phone_number', 'date_joined')
+        # Uniqueness is checked in validate_email, and only when the email changes
+        extra_kwargs = {'email': {'validators': []}}
 
     def validate_email(self, value):
         user = self.instance 
+        if user and value == user.email:
+            return value # Unchanged, no need to check it again
         if value: 
             # Check if another user already has this email
             if User.objects.filter(email=value).exclude(pk=user.pk if user else None).exists():
                 raise serializers.ValidationError("A user with this email address already exists.")
-        return value
\ No newline at end of file
+        return value
+
+    def update(self, instance, validated_data):
+        changed = [field for field, value in validated_data.items() if getattr(instance, field) != value]
+        if not changed:
+            return instance # Nothing to write, the profile version stays the same
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        # Incremented in the database, so concurrent updates never share a version
+        instance.profile_version = F('profile_version') + 1
+        instance.save(update_fields=changed + ['profile_version'])
+        instance.refresh_from_db(fields=['profile_version'])
+        return instance
\ No newline at end of file
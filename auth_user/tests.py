@@ -1 +1,140 @@
-from django.test import TestCase
+import time
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .models import RevokedToken, User
+from .tokens import get_or_create_token_key, issue_signed_token
+
+PASSWORD = 'pw-12345!'
+
+
+class TokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(phone_number='+15557000001', name='Token User', password=PASSWORD)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/auth/login/', {'username': self.user.phone_number, 'password': PASSWORD})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['token']
+
+    def get_profile(self, token, keyword='Bearer'):
+        return self.client.get('/auth/profile/', HTTP_AUTHORIZATION=f'{keyword} {token}')
+
+    def test_repeat_logins_return_the_same_key(self):
+        key = self.login()
+        self.assertEqual(self.login(), key)
+        self.assertEqual(Token.objects.get(user=self.user).key, key)
+        self.assertEqual(self.get_profile(key, 'Token').status_code, 200)
+
+    def test_get_or_create_fallback(self):
+        # Databases without INSERT .. ON CONFLICT .. RETURNING use get_or_create
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            key = get_or_create_token_key(self.user)
+            self.assertEqual(get_or_create_token_key(self.user), key)
+        self.assertEqual(get_or_create_token_key(self.user), key)
+        self.assertEqual(Token.objects.get(user=self.user).key, key)
+
+    @override_settings(AUTH_SIGNED_TOKENS=True)
+    def test_revoked_token(self):
+        token = self.login()
+        self.assertEqual(self.get_profile(token).status_code, 200)
+        response = self.client.post('/auth/logout/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+        response = self.get_profile(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'Token has been revoked.')
+        # Other sessions of the same user are not affected
+        self.assertEqual(self.get_profile(self.login()).status_code, 200)
+
+    @override_settings(AUTH_SIGNED_TOKENS=True, AUTH_SIGNED_TOKEN_MAX_AGE=60)
+    def test_expired_token(self):
+        with mock.patch('django.core.signing.time.time', return_value=time.time() - 61):
+            token = issue_signed_token(self.user)
+        response = self.get_profile(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'Token has expired.')
+
+    @override_settings(AUTH_SIGNED_TOKENS=True)
+    def test_inactive_user(self):
+        token = self.login()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.get_profile(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'User inactive or deleted.')
+
+
+class ProfileETagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            phone_number='+15557000002', name='Profile User', email='profile@example.com', password=PASSWORD
+        )
+        User.objects.create_user(phone_number='+15557000003', name='Other', email='other@example.com')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_profile(self, if_none_match=None):
+        headers = {'HTTP_IF_NONE_MATCH': if_none_match} if if_none_match else {}
+        return self.client.get('/auth/profile/', **headers)
+
+    def test_not_modified(self):
+        response = self.get_profile()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        for if_none_match in (etag, f'W/{etag}', f'"other", W/{etag}', '*'):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.get_profile(if_none_match)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertFalse(response.content)
+        for if_none_match in ('"other"', 'W/"other"', etag.replace('-', '-9')):
+            with self.subTest(if_none_match=if_none_match):
+                self.assertEqual(self.get_profile(if_none_match).status_code, 200)
+
+    def test_version_changes_only_with_the_profile(self):
+        etag = self.get_profile()['ETag']
+        # Sending the current values writes nothing and keeps the version
+        response = self.client.patch('/auth/profile/', {'name': 'Profile User', 'email': 'profile@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get_profile(etag).status_code, 304)
+
+        response = self.client.patch('/auth/profile/', {'name': 'Renamed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        response = self.get_profile(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Renamed')
+        self.assertEqual(self.get_profile(response['ETag']).status_code, 304)
+
+    def email_lookups(self, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch('/auth/profile/', data)
+        return response, [q['sql'] for q in queries if q['sql'].startswith('SELECT') and '"email" =' in q['sql']]
+
+    def test_email_uniqueness_checked_only_when_changed(self):
+        response, lookups = self.email_lookups({'name': 'New Name', 'email': 'profile@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(lookups, [])
+
+        response, lookups = self.email_lookups({'email': 'other@example.com'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(lookups), 1)
+
+        response, lookups = self.email_lookups({'email': 'new@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(lookups), 1)
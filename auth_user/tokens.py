@@ -0,0 +1,66 @@
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import RevokedToken
+
+SIGNED_TOKEN_SALT = 'auth_user.signed-token'
+
+
+def get_or_create_token_key(user):
+    # Token.objects.get_or_create costs a SELECT plus a savepoint-wrapped INSERT on
+    # first login, and two concurrent logins for the same user can both miss the
+    # SELECT and collide on the INSERT. A single INSERT .. ON CONFLICT .. RETURNING
+    # gives back either the new key or the one that already exists.
+    if connection.vendor not in ('sqlite', 'postgresql') or not connection.features.can_return_columns_from_insert:
+        token, _ = Token.objects.get_or_create(user=user)
+        return token.key
+
+    qn = connection.ops.quote_name
+    table = qn(Token._meta.db_table)
+    key_col = qn(Token._meta.get_field('key').column)
+    user_col = qn(Token._meta.get_field('user').column)
+    created_col = qn(Token._meta.get_field('created').column)
+    created = Token._meta.get_field('created').get_db_prep_value(timezone.now(), connection)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({key_col}, {user_col}, {created_col}) VALUES (%s, %s, %s) '
+            f'ON CONFLICT ({user_col}) DO UPDATE SET {key_col} = {table}.{key_col} '
+            f'RETURNING {key_col}',
+            [Token.generate_key(), user.pk, created],
+        )
+        return cursor.fetchone()[0]
+
+
+def issue_signed_token(user):
+    # Signed token: verifying it needs only SECRET_KEY (or SECRET_KEY_FALLBACKS while
+    # keys are being rotated). Revocation is checked when the user row is loaded.
+    return signing.dumps({'uid': user.pk, 'jti': secrets.token_hex(8)}, salt=SIGNED_TOKEN_SALT)
+
+
+def verify_signed_token(token):
+    try:
+        claims = signing.loads(token, salt=SIGNED_TOKEN_SALT, max_age=settings.AUTH_SIGNED_TOKEN_MAX_AGE)
+    except signing.SignatureExpired:
+        raise AuthenticationFailed('Token has expired.')
+    except signing.BadSignature:
+        raise AuthenticationFailed('Invalid token.')
+    return claims
+
+
+def revoke_signed_token(claims):
+    # A revoked token only needs remembering until it would have expired anyway,
+    # which keeps the denylist bounded by logouts within one token lifetime.
+    now = timezone.now()
+    RevokedToken.objects.filter(expires_at__lt=now).delete()
+    RevokedToken.objects.get_or_create(
+        jti=claims['jti'],
+        defaults={'expires_at': now + timedelta(seconds=settings.AUTH_SIGNED_TOKEN_MAX_AGE)},
+    )
@@ -1,3 +1,6 @@
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -7,6 +10,7 @@ from rest_framework.views import APIView
 
 from .serializers import UserProfileSerializer, UserRegistrationSerializer 
 from .models import User
+from .tokens import get_or_create_token_key, issue_signed_token, revoke_signed_token
 
 class UserRegistrationView(generics.CreateAPIView):
     serializer_class = UserRegistrationSerializer
@@ -32,10 +36,13 @@ class UserLoginView(ObtainAuthToken):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True) # Will raise 400 if invalid
         user = serializer.validated_data['user']
-        token, created = Token.objects.get_or_create(user=user)
+        if settings.AUTH_SIGNED_TOKENS:
+            token_key = issue_signed_token(user)
+        else:
+            token_key = get_or_create_token_key(user)
         
         return Response({
-            'token': token.key,
+            'token': token_key,
             'user_id': user.pk,
             'phone_number': user.phone_number,
             'name': user.name,
@@ -46,6 +53,10 @@ class UserLogoutView(APIView):
     permission_classes = [IsAuthenticated] # Only authenticated users can log out
 
     def post(self, request, *args, **kwargs):
+        if isinstance(request.auth, dict):
+            # Signed tokens have no row to delete, so revoke them instead
+            revoke_signed_token(request.auth)
+            return Response({"message": "Successfully logged out."}, status=status.HTTP_200_OK)
         try:
             # Simply delete the token to invalidate it
             request.user.auth_token.delete()
@@ -63,8 +74,29 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         # Returns the currently authenticated user.
         return self.request.user
 
+    @staticmethod
+    def profile_etag(user):
+        return f'"{user.pk}-{user.profile_version}"'
+
+    def retrieve(self, request, *args, **kwargs):
+        # Clients poll the profile at app start: an unchanged profile is answered with
+        # 304 from the version counter alone, without serializing it.
+        user = self.get_object()
+        etag = self.profile_etag(user)
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        # If-None-Match uses the weak comparison: a proxy that compresses the response
+        # hands the client a W/ prefixed copy of the ETag
+        if '*' in if_none_match or etag in {tag.removeprefix('W/') for tag in if_none_match}:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
     def update(self, request, *args, **kwargs):
         response = super().update(request, *args, **kwargs)
         if response.status_code == status.HTTP_200_OK:
-            return Response({"message": "Profile updated successfully.", "data": response.data})
+            response = Response({"message": "Profile updated successfully.", "data": response.data})
+            response['ETag'] = self.profile_etag(request.user)
         return response
\ No newline at end of file
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -40,6 +41,27 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Runtime profile
+# "api" drops the admin, sessions, messages and static files apps and their middleware,
+# which a token-authenticated JSON API does not need, to speed up worker cold start.
+
+RUNTIME_PROFILE = os.environ.get('DJANGO_RUNTIME_PROFILE', 'full')
+
+if RUNTIME_PROFILE == 'api':
+    INSTALLED_APPS = [
+        app for app in INSTALLED_APPS
+        if app not in (
+            'django.contrib.admin',
+            'django.contrib.sessions',
+            'django.contrib.messages',
+            'django.contrib.staticfiles',
+        )
+    ]
+    MIDDLEWARE = [
+        'django.middleware.security.SecurityMiddleware',
+        'django.middleware.common.CommonMiddleware',
+    ]
+
 ROOT_URLCONF = 'instahyre_test.urls'
 
 TEMPLATES = [
@@ -88,19 +110,127 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing pool
+# Number of worker processes used for password hashing and verification.
+# 0 keeps hashing on the request thread.
+
+PASSWORD_HASHING_POOL_SIZE = 0
+
+# Hashes allowed in flight before new requests wait (defaults to 4 per worker),
+# and how long they wait in seconds before getting a 503.
+
+PASSWORD_HASHING_POOL_MAX_PENDING = None
+
+PASSWORD_HASHING_POOL_WAIT = 2.0
+
+# Signed login tokens
+# When enabled, login returns a stateless signed token (sent as "Authorization: Bearer <token>")
+# instead of a database token. Lifetime is in seconds.
+
+AUTH_SIGNED_TOKENS = False
+
+AUTH_SIGNED_TOKEN_MAX_AGE = 60 * 60 * 24
+
+# Phone lookup snapshot
+# File written by `manage.py export_phone_snapshot`. When set, phone searches are answered
+# from the memory-mapped snapshot, except for numbers with change feed events newer than
+# the export, which are looked up in the database.
+
+PHONE_SNAPSHOT_PATH = None
+
+# Spam scoring
+# A number with this many reports or more has a 100% spam likelihood. Likelihoods are
+# computed from the report counts on read, so a new threshold applies immediately.
+
+SPAM_MAX_REPORTS_FOR_HIGH_SPAM = 10
+
+# Reports for one number are counted in this many sub-counter rows, picked by reporter
+# id, so concurrent reports do not all wait on one row lock. Run
+# `manage.py compact_spam_counters` periodically to fold them into SpamScore.
+
+SPAM_COUNTER_STRIPES = 16
+
+# Spam leaderboard
+# Report counts for /api/spam/top/ are kept in memory per process and follow the reports
+# written through it. They are reloaded from the database every SPAM_TRENDS_RELOAD_INTERVAL
+# seconds (0 disables reloading) to include other processes' reports and deletes.
+
+SPAM_TRENDS_RELOAD_INTERVAL = 300
+
+# Hot phone numbers
+# Lookup payloads for the HOT_NUMBERS_PINNED most looked-up numbers are precomputed and
+# pinned in memory, refreshed every HOT_NUMBERS_WARM_INTERVAL seconds (0 disables warming).
+
+HOT_NUMBERS_PINNED = 100
+
+HOT_NUMBERS_WARM_INTERVAL = 60
+
+# Search-as-you-type cache
+# Name search results are kept per user for TYPEAHEAD_CACHE_TTL seconds (0 disables the
+# cache), so a query that extends a recent one is filtered in memory. At most
+# TYPEAHEAD_CACHE_QUERIES_PER_USER result lists of up to TYPEAHEAD_CACHE_MAX_RESULTS
+# entries are kept for each of the TYPEAHEAD_CACHE_USERS most recent users per process.
+# User and contact writes invalidate it through a counter in TYPEAHEAD_GENERATION_CACHE,
+# so the cache is only used when that is a cache shared by all processes (not local
+# memory or dummy; `manage.py check --deploy` warns about them), for example:
+#
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#         'LOCATION': 'redis://127.0.0.1:6379',
+#     },
+# }
+
+TYPEAHEAD_CACHE_TTL = 30
+
+TYPEAHEAD_CACHE_USERS = 1000
+
+TYPEAHEAD_CACHE_QUERIES_PER_USER = 8
+
+TYPEAHEAD_CACHE_MAX_RESULTS = 500
+
+TYPEAHEAD_GENERATION_CACHE = 'default'
+
 # DRF Settings
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
+        'auth_user.authentication.SignedTokenAuthentication',
         # If you want to support session auth for browsable API, add it too:
         # 'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated', # Default to requiring authentication
-    ]
+    ],
+    # Only views that set throttle_scope are throttled
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.ScopedGCRAThrottle',
+        'api.throttling.ScopedIPGCRAThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'search': '120/min',
+        'search_ip': '300/min',
+        'spam': '20/min',
+        'spam_ip': '60/min',
+    },
+    # Per-IP limits key on REMOTE_ADDR, as clients can send any X-Forwarded-For. Behind
+    # trusted reverse proxies, set this to how many of them append to the header.
+    'NUM_PROXIES': 0,
 }
 
+if RUNTIME_PROFILE == 'api':
+    # The browsable API needs templates and static files
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = ['rest_framework.renderers.JSONRenderer']
+
+# Throttle state store: 'local' (per process) or 'cache' (the API_THROTTLE_CACHE cache).
+# Limits are only shared across processes if that cache is, e.g. Redis or Memcached;
+# the default local memory cache is per process too.
+
+API_THROTTLE_STORE = 'local'
+
+API_THROTTLE_CACHE = 'default'
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -1,8 +1,12 @@
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('auth/', include('auth_user.urls')),  # URLs for authentication and user management
     path('api/', include('api.urls')),        # URLs for the other API endpoints
 ]
+
+if apps.is_installed('django.contrib.admin'): # Not installed in the "api" runtime profile
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))